@@ -0,0 +1,76 @@
+"""
+Bitboard utilities for battleship - integer bitmask representation of boards and ships
+
+Cell (row, col) of an n x n grid is bit row * n + col, so a 10x10 board fits in a
+100-bit Python int and larger grids scale without any changes. Shots, hits, misses
+and every ship are plain ints. The engines use them to enumerate ship placements:
+whether a placement avoids the misses and sunk ships, or covers a hit, is a single
+bitwise operation. Hit and sunk checks during a game are answered by GameState's
+per-ship counters instead.
+"""
+from functools import lru_cache
+
+from game_utils import GRID_SIZE
+
+def cell_bit(row, col, n=GRID_SIZE):
+    """Bit for a single cell"""
+    return 1 << (row * n + col)
+
+def coords_to_mask(coords, n=GRID_SIZE):
+    """Convert an iterable of (row, col) tuples to a bitmask"""
+    mask = 0
+    for row, col in coords:
+        mask |= 1 << (row * n + col)
+    return mask
+
+def mask_to_coords(mask, n=GRID_SIZE):
+    """Convert a bitmask back to a sorted list of (row, col) tuples"""
+    coords = []
+    while mask:
+        low = mask & -mask
+        index = low.bit_length() - 1
+        coords.append(divmod(index, n))
+        mask ^= low
+    return coords
+
+def ship_masks(ships, n=GRID_SIZE):
+    """One bitmask per ship"""
+    return [coords_to_mask(ship, n) for ship in ships]
+
+def fleet_mask(masks):
+    """Union of all ship masks"""
+    mask = 0
+    for ship in masks:
+        mask |= ship
+    return mask
+
+@lru_cache(maxsize=None)
+def placement_mask(row, col, ship_len, horizontal, n=GRID_SIZE):
+    """Bitmask of a ship placement, or 0 if it runs off the board"""
+    if horizontal:
+        if col + ship_len > n:
+            return 0
+        return ((1 << ship_len) - 1) << (row * n + col)
+    if row + ship_len > n:
+        return 0
+    mask = 0
+    for k in range(ship_len):
+        mask |= 1 << ((row + k) * n + col)
+    return mask
+
+@lru_cache(maxsize=None)
+def placement_table(ship_len, n=GRID_SIZE):
+    """All on-board placements of a ship length as (mask, cell_indices) pairs, built once per grid size"""
+    table = []
+    for horizontal in (True, False):
+        for row in range(n):
+            for col in range(n):
+                mask = placement_mask(row, col, ship_len, horizontal, n)
+                if mask:
+                    cells = tuple(row * n + col + (k if horizontal else k * n) for k in range(ship_len))
+                    table.append((mask, cells))
+    return tuple(table)
+
+def legal_placements(blocked, ship_len, n=GRID_SIZE):
+    """Placements of a ship length that avoid every blocked cell"""
+    return [entry for entry in placement_table(ship_len, n) if entry[0] & blocked == 0]
@@ -0,0 +1,138 @@
+"""
+Fleet corpus utilities for battleship - fixed-width binary files of fleet layouts
+
+A corpus file is a 64-byte header followed by one record per fleet. A record is
+the fleet's placement indices (see fleet_utils), one byte per ship, so the
+standard fleet takes 5 bytes and 10M fleets fit in 50MB. The reader maps the file
+instead of loading it: opening is instant whatever the size, records are read
+straight from the page cache, and every process mapping the same file shares one
+copy of it.
+
+Usage:
+    python corpus_utils.py fleets.bin --count 10000000 --seed 0
+"""
+import argparse
+import mmap
+import struct
+from functools import lru_cache
+
+from fleet_utils import fill_fleets, fleet_masks, fleet_ships
+from game_utils import GRID_SIZE, SHIP_SIZES
+
+MAGIC = b'BSFLEETS'
+VERSION = 1
+# magic, version, grid size, ships per fleet, fleet count, seed; then the ship sizes
+HEADER = struct.Struct('<8sHBBQq')
+HEADER_SIZE = 64
+
+def write_corpus(path, count, seed=0, sizes=SHIP_SIZES, n=GRID_SIZE):
+    """Write count fleets drawn with fill_fleets(seed) to a new corpus file
+
+    The records are generated straight into the mapped file, so no copy of the
+    corpus is held in memory.
+    """
+    width = len(sizes)
+    if HEADER.size + width > HEADER_SIZE:
+        raise ValueError(f"A corpus header holds at most {HEADER_SIZE - HEADER.size} ships per fleet")
+    with open(path, 'w+b') as file:
+        file.truncate(HEADER_SIZE + count * width)
+        with mmap.mmap(file.fileno(), 0) as mapped:
+            HEADER.pack_into(mapped, 0, MAGIC, VERSION, n, width, count, seed)
+            mapped[HEADER.size:HEADER.size + width] = bytes(sizes)
+            with memoryview(mapped) as view:
+                fill_fleets(view[HEADER_SIZE:], seed, sizes, n)
+            mapped.flush()
+
+class FleetCorpus:
+    """Read-only, memory-mapped view of a corpus file, indexed by game number
+
+    corpus[i] is fleet i's placement index tuple, record(i) the raw bytes of it
+    without a copy, and ships(i) its ship coordinate lists. records is the whole
+    record area as a memoryview, for bulk use such as numpy.frombuffer. A corpus
+    pickles as its path, so it can be handed to worker processes, which map the
+    file themselves.
+    """
+    __slots__ = ('path', 'file', 'map', 'records', 'n', 'sizes', 'width', 'count', 'seed')
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} is not a fleet corpus") from None
+        try:
+            if len(self.map) < HEADER_SIZE:
+                raise ValueError(f"{path} is not a fleet corpus")
+            magic, version, self.n, self.width, self.count, self.seed = HEADER.unpack_from(self.map)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a fleet corpus")
+            if version != VERSION:
+                raise ValueError(f"{path} is corpus version {version}, expected {VERSION}")
+            self.sizes = tuple(self.map[HEADER.size:HEADER.size + self.width])
+            end = HEADER_SIZE + self.count * self.width
+            if len(self.map) < end:
+                raise ValueError(f"{path} is truncated: {self.count} fleets expected")
+        except ValueError:
+            self.map.close()
+            self.file.close()
+            raise
+        self.records = memoryview(self.map)[HEADER_SIZE:end]
+
+    def __len__(self):
+        return self.count
+
+    def record(self, index):
+        """Raw placement index bytes of fleet index, as a memoryview into the file"""
+        if not 0 <= index < self.count:
+            raise IndexError(f"fleet {index} out of range for a corpus of {self.count}")
+        start = index * self.width
+        return self.records[start:start + self.width]
+
+    def __getitem__(self, index):
+        return tuple(self.record(index))
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def ships(self, index):
+        """Ship coordinate lists of fleet index, in the format generate_ships returns"""
+        return fleet_ships(self[index], self.sizes, self.n)
+
+    def masks(self, index):
+        """One bitmask per ship of fleet index"""
+        return fleet_masks(self[index], self.sizes, self.n)
+
+    def close(self):
+        self.records.release()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __reduce__(self):
+        return FleetCorpus, (self.path,)
+
+@lru_cache(maxsize=None)
+def open_corpus(path):
+    """FleetCorpus for path, mapped once per process and kept open"""
+    return FleetCorpus(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a fleet corpus file of uniformly random fleets")
+    parser.add_argument("path", help="corpus file to create")
+    parser.add_argument("--count", type=int, default=1000000, help="number of fleets")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the fleet stream")
+    args = parser.parse_args()
+    write_corpus(args.path, args.count, args.seed)
+    with FleetCorpus(args.path) as corpus:
+        print(f"Wrote {len(corpus)} fleets of {corpus.sizes} on a {corpus.n}x{corpus.n} grid to {args.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Fleet utilities for battleship - exact-uniform random fleet layouts, one at a time or in bulk
+
+A fleet is encoded as one index per ship into placement_table(ship_len, n), in
+SHIP_SIZES order. On a 10x10 board every index fits in a byte, so a fleet is a
+fixed-width record of len(SHIP_SIZES) bytes.
+
+Each ship's placement is drawn uniformly from its table and an attempt is thrown
+away as soon as a ship overlaps an earlier one. Every non-overlapping layout is
+equally likely to survive an attempt, so accepted fleets are exactly uniform over
+all legal layouts, and attempts repeat until one is accepted (about two in five
+are, for the standard fleet). Indices are drawn with getrandbits and rejected when
+out of range, which is exact and cheaper than randrange.
+"""
+import random
+from functools import lru_cache
+
+from bitboard_utils import coords_to_mask, placement_table
+from game_utils import GRID_SIZE, SHIP_SIZES
+
+@lru_cache(maxsize=None)
+def _placement_masks(sizes, n):
+    """Per ship, the tuple of placement masks its indices refer to"""
+    return tuple(tuple(mask for mask, _ in placement_table(ship_len, n)) for ship_len in sizes)
+
+@lru_cache(maxsize=None)
+def _sampling_tables(sizes, n):
+    """Per ship, (placement masks, number of placements, bits needed to draw an index)"""
+    return tuple((masks, len(masks), (len(masks) - 1).bit_length()) for masks in _placement_masks(sizes, n))
+
+def sample_fleet(rng=random, sizes=SHIP_SIZES, n=GRID_SIZE):
+    """Draw one uniformly random legal fleet, returns its placement indices"""
+    tables = _sampling_tables(tuple(sizes), n)
+    getrandbits = rng.getrandbits
+    while True:
+        fleet = 0
+        picks = []
+        for masks, count, bits in tables:
+            p = getrandbits(bits)
+            while p >= count:
+                p = getrandbits(bits)
+            mask = masks[p]
+            if fleet & mask:
+                break
+            fleet |= mask
+            picks.append(p)
+        else:
+            return tuple(picks)
+
+def fleet_ships(indices, sizes=SHIP_SIZES, n=GRID_SIZE):
+    """Ship coordinate lists of a fleet, in the format generate_ships returns"""
+    return [[divmod(idx, n) for idx in placement_table(ship_len, n)[p][1]] for ship_len, p in zip(sizes, indices)]
+
+@lru_cache(maxsize=None)
+def _placement_indices(ship_len, n):
+    """Placement mask -> its index in placement_table(ship_len, n)"""
+    return {mask: p for p, (mask, _) in enumerate(placement_table(ship_len, n))}
+
+def fleet_indices(ships, n=GRID_SIZE):
+    """Placement indices of a fleet given as ship coordinate lists, the inverse of fleet_ships"""
+    return tuple(_placement_indices(len(ship), n)[coords_to_mask(ship, n)] for ship in ships)
+
+def fleet_masks(indices, sizes=SHIP_SIZES, n=GRID_SIZE):
+    """One bitmask per ship of a fleet, like ship_masks"""
+    return [masks[p] for masks, p in zip(_placement_masks(tuple(sizes), n), indices)]
+
+def iter_fleets(count, seed=None, sizes=SHIP_SIZES, n=GRID_SIZE):
+    """Yield count fleets as placement index tuples from their own RNG stream
+
+    The same seed always yields the same fleets, and fill_fleets with that seed
+    writes the same fleets in the same order.
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield sample_fleet(rng, sizes, n)
+
+def fill_fleets(out, seed=None, sizes=SHIP_SIZES, n=GRID_SIZE):
+    """Fill a preallocated byte buffer with fleets, returns how many were written
+
+    out is any writable, C-contiguous buffer of unsigned bytes (bytearray,
+    array('B'), a uint8 ndarray of shape (count, len(sizes)), an mmap) and receives
+    len(out) // len(sizes) fleets of one placement index byte per ship. Buffers of
+    any other item type raise ValueError.
+    """
+    if any(len(placement_table(ship_len, n)) > 256 for ship_len in sizes):
+        raise ValueError(f"Placement indices for a {n}x{n} board do not fit in a byte")
+    view = memoryview(out)
+    # cast('B') would happily reinterpret the bytes of an array('H') or an int8 array
+    if view.itemsize != 1 or view.format.lstrip('@=<>!') not in ('B', 'c'):
+        raise ValueError(f"fill_fleets needs a buffer of unsigned bytes, got format {view.format!r}")
+    view = view.cast('B')
+    width = len(sizes)
+    count = len(view) // width
+    # Encode in chunks, a bytes() per fleet costs more than the sampling itself
+    chunk = 4096
+    written = 0
+    fleets = iter_fleets(count, seed, sizes, n)
+    while written < count:
+        batch = min(chunk, count - written)
+        record = bytearray()
+        for _ in range(batch):
+            record += bytes(next(fleets))
+        view[written * width:(written + batch) * width] = record
+        written += batch
+    return count
@@ -1,33 +1,22 @@
 """
 Game utilities for battleship - core game logic functions
 """
+import os
 import random
 
 # Grid settings
 GRID_SIZE = 10
+SHIP_SIZES = [5, 4, 3, 3, 2]
 
-def generate_ships():
-    """Generate random ship positions for a new game"""
-    ship_sizes = [5, 4, 3, 3, 2]
-    ships = []
-    for ship_size in ship_sizes:
-        placed = False
-        attempts = 0
-        while not placed and attempts < 100:
-            start_row = random.randint(0, GRID_SIZE - 1)
-            start_col = random.randint(0, GRID_SIZE - 1)
-            orientation = random.randint(0, 1)
-            if is_valid_placement(ships, start_row, start_col, ship_size, orientation):
-                ship_coords = []
-                for i in range(ship_size):
-                    if orientation == 0:
-                        ship_coords.append((start_row, start_col + i))
-                    else:
-                        ship_coords.append((start_row + i, start_col))
-                ships.append(ship_coords)
-                placed = True
-            attempts += 1
-    return ships
+def generate_ships(rng=random):
+    """Generate random ship positions for a new game
+
+    Layouts are exactly uniform over all legal fleets and always hold one ship per
+    entry of SHIP_SIZES (see fleet_utils).
+    """
+    # Imported here, fleet_utils builds on the bitboard tables which import this module
+    from fleet_utils import fleet_ships, sample_fleet
+    return fleet_ships(sample_fleet(rng))
 
 def is_valid_placement(existing_ships, start_row, start_col, ship_size, orientation):
     """Check if a ship placement is valid (doesn't overlap with existing ships)"""
@@ -35,11 +24,88 @@ def is_valid_placement(existing_ships, start_row, start_col, ship_size, orientat
         return False
     if orientation == 1 and start_row + ship_size > GRID_SIZE:
         return False
+    taken = {coord for ship in existing_ships for coord in ship}
     new_ship_coords = [(start_row, start_col + i) if orientation == 0 else (start_row + i, start_col) for i in range(ship_size)]
-    for ship in existing_ships:
-        if any(c in new_ship_coords for c in ship):
-            return False
-    return True
+    return not any(coord in taken for coord in new_ship_coords)
+
+class GameState:
+    """One side's shots at a fleet, with O(1) shot resolution and sunk detection
+
+    cell_ship maps every ship cell to its index in ships and left counts each ship's
+    unhit cells, so neither a shot nor a sunk check scans the fleet. hits, misses,
+    current_hits and occupied are the collections the engines take; pass existing
+    ones to wrap them in place, or leave them out for a fresh game. last_shot is the
+    (row, col, ship index or None) of the latest fire().
+    """
+    __slots__ = ('ships', 'cell_ship', 'left', 'sunk', 'hits', 'misses', 'current_hits', 'occupied', 'last_shot')
+
+    def __init__(self, ships, hits=None, misses=None, current_hits=None, occupied=None):
+        self.ships = ships
+        self.cell_ship = {coord: i for i, ship in enumerate(ships) for coord in ship}
+        self.hits = set() if hits is None else hits
+        self.misses = set() if misses is None else misses
+        self.current_hits = [] if current_hits is None else current_hits
+        self.occupied = create_board() if occupied is None else occupied
+        self.left = [len(ship) for ship in ships]
+        for coord in self.hits:
+            ship = self.cell_ship.get(coord)
+            if ship is not None:
+                self.left[ship] -= 1
+        self.sunk = self.left.count(0)
+        self.last_shot = None
+
+    def fire(self, row, col):
+        """Record a shot, returns the index of the ship it hit or None for a miss"""
+        coord = (row, col)
+        self.occupied[row][col] = 1
+        ship = self.cell_ship.get(coord)
+        if ship is None:
+            self.misses.add(coord)
+        elif coord not in self.hits:
+            self.hits.add(coord)
+            self.left[ship] -= 1
+            if self.left[ship] == 0:
+                self.sunk += 1
+        self.last_shot = (row, col, ship)
+        return ship
+
+    def is_hit(self, row, col):
+        """Check if a shot at (row, col) hits any ship"""
+        return (row, col) in self.cell_ship
+
+    def is_sunk(self, ship):
+        """Check if the ship at index ship has been sunk"""
+        return self.left[ship] == 0
+
+    def all_sunk(self):
+        """Check if all ships have been sunk"""
+        return self.sunk == len(self.ships)
+
+    def remaining_ships(self):
+        """Ships that still have unhit cells"""
+        return [ship for ship, left in zip(self.ships, self.left) if left]
+
+    def shots(self):
+        """Number of shots taken so far"""
+        return len(self.hits) + len(self.misses)
+
+    def clone(self):
+        """Independent copy, sharing only the read-only fleet and cell index"""
+        clone = GameState.__new__(GameState)
+        clone.ships = self.ships
+        clone.cell_ship = self.cell_ship
+        clone.left = self.left[:]
+        clone.sunk = self.sunk
+        clone.hits = set(self.hits)
+        clone.misses = set(self.misses)
+        clone.current_hits = self.current_hits[:]
+        clone.occupied = [row[:] for row in self.occupied]
+        clone.last_shot = self.last_shot
+        return clone
+
+def pool_workers(pool):
+    """Number of workers of a concurrent.futures Executor, or this machine's cores if it does not say"""
+    return getattr(pool, '_max_workers', None) or os.cpu_count() or 1
 
 def get_grid_pos(mouse_x, mouse_y, grid_x, grid_y, cell_size, grid_width, grid_height):
     """Convert mouse coordinates to grid position"""
@@ -118,8 +184,12 @@ def target_shot(current_hits, occupied):
                 return (nr,nc)
     return None
 
-def enhanced_target_shot_multi_ship(current_hits, occupied, enemy_hits, enemy_misses, player_ships):
-    """Enhanced target mode that handles multiple adjacent ships by tracking unsunk ship hits"""
+def enhanced_target_shot_multi_ship(current_hits, occupied, enemy_hits, enemy_misses, player_ships, game=None):
+    """Enhanced target mode that handles multiple adjacent ships by tracking unsunk ship hits
+
+    game, a GameState for these ships and hits, answers the sunk checks from its
+    counters instead of scanning the ships.
+    """
     directions = [(-1,0),(1,0),(0,-1),(0,1)]
     n = len(occupied)
     
@@ -128,14 +198,20 @@ def enhanced_target_shot_multi_ship(current_hits, occupied, enemy_hits, enemy_mi
     
     # First, remove hits from ships that are already sunk
     unsunk_hits = []
-    for hit_pos in current_hits:
-        # Check if this hit belongs to a ship that is NOT completely sunk
-        for ship in player_ships:
-            if hit_pos in ship:
-                # If this ship is not completely sunk, keep the hit
-                if not all(coord in enemy_hits for coord in ship):
-                    unsunk_hits.append(hit_pos)
-                break
+    if game is not None:
+        for hit_pos in current_hits:
+            ship = game.cell_ship.get(hit_pos)
+            if ship is not None and not game.is_sunk(ship):
+                unsunk_hits.append(hit_pos)
+    else:
+        for hit_pos in current_hits:
+            # Check if this hit belongs to a ship that is NOT completely sunk
+            for ship in player_ships:
+                if hit_pos in ship:
+                    # If this ship is not completely sunk, keep the hit
+                    if not all(coord in enemy_hits for coord in ship):
+                        unsunk_hits.append(hit_pos)
+                    break
     
     # Update current_hits to only include hits from unsunk ships
     current_hits = unsunk_hits
@@ -1,6 +1,14 @@
 """
 Graphics utilities for battleship - drawing functions
+
+Fonts and rendered text are cached, so the draw_* functions can run every frame
+without building fonts. SceneRenderer goes further for the game windows: the grids
+are drawn once into a background surface, boards and text are dirty sprites that
+re-render only when their contents change, and only the changed rectangles are
+pushed to the display.
 """
+from functools import lru_cache
+
 import pygame
 
 # Grid settings (these should match main files)
@@ -12,20 +20,25 @@ BLUE = (0, 100, 200)
 RED = (200, 0, 0)
 GRAY = (128, 128, 128)
 
+@lru_cache(maxsize=None)
+def get_font(size):
+    """Default font at size, created once"""
+    return pygame.font.Font(None, size)
+
+@lru_cache(maxsize=256)
+def render_text(text, size, color):
+    """Rendered text surface, re-rendered only for text not seen recently"""
+    return get_font(size).render(text, True, color)
+
 def draw_grid(surface, x, y, title, cell_size, grid_width, grid_height):
     """Draw the game grid with labels"""
-    font = pygame.font.Font(None, 36)
-    text = font.render(title, True, BLACK)
-    surface.blit(text, (x, y - 60))
+    surface.blit(render_text(title, 36, BLACK), (x, y - 60))
     for i in range(GRID_SIZE + 1):
         pygame.draw.line(surface, BLACK, (x + i * cell_size, y), (x + i * cell_size, y + grid_height), 2)
         pygame.draw.line(surface, BLACK, (x, y + i * cell_size), (x + grid_width, y + i * cell_size), 2)
-    small_font = pygame.font.Font(None, 24)
     for i in range(GRID_SIZE):
-        label = small_font.render(str(i + 1), True, BLACK)
-        surface.blit(label, (x - 25, y + i * cell_size + 12))
-        label = small_font.render(chr(ord('A') + i), True, BLACK)
-        surface.blit(label, (x + i * cell_size + 15, y - 25))
+        surface.blit(render_text(str(i + 1), 24, BLACK), (x - 25, y + i * cell_size + 12))
+        surface.blit(render_text(chr(ord('A') + i), 24, BLACK), (x + i * cell_size + 15, y - 25))
 
 def draw_hits_misses(surface, x, y, hits, misses, cell_size):
     """Draw hits and misses on the grid"""
@@ -39,18 +52,162 @@ def draw_hits_misses(surface, x, y, hits, misses, cell_size):
         pygame.draw.line(surface, RED, (cell_x, cell_y), (cell_x + cell_size - 10, cell_y + cell_size - 10), 4)
         pygame.draw.line(surface, RED, (cell_x + cell_size - 10, cell_y), (cell_x, cell_y + cell_size - 10), 4)
 
+def statistics_text(games_played, ai_wins, ai_shot_counts):
+    """Statistics line shown under the boards, None before the first game ends"""
+    if games_played == 0:
+        return None
+    stats_text = f"Games: {games_played} | AI Wins: {ai_wins} ({ai_wins/games_played*100:.1f}%)"
+    if len(ai_shot_counts) > 0:
+        avg_shots = sum(ai_shot_counts) / len(ai_shot_counts)
+        stats_text += f" | Avg Shots: {avg_shots:.1f}"
+    return stats_text
+
 def draw_statistics(surface, games_played, ai_wins, ai_shot_counts):
     """Draw game statistics on screen"""
-    small_font = pygame.font.Font(None, 32)
-    if games_played > 0:
+    stats_text = statistics_text(games_played, ai_wins, ai_shot_counts)
+    if stats_text is not None:
         stats_y = 600
-        stats_text = f"Games: {games_played} | AI Wins: {ai_wins} ({ai_wins/games_played*100:.1f}%)"
-        if len(ai_shot_counts) > 0:
-            avg_shots = sum(ai_shot_counts) / len(ai_shot_counts)
-            stats_text += f" | Avg Shots: {avg_shots:.1f}"
-        stats_surface = small_font.render(stats_text, True, BLACK)
-        surface.blit(stats_surface, (10, stats_y))
+        surface.blit(render_text(stats_text, 32, BLACK), (10, stats_y))
         
         # Instructions
-        instructions = small_font.render("Press R to reset game", True, GRAY)
-        surface.blit(instructions, (10, stats_y + 30))
\ No newline at end of file
+        surface.blit(render_text("Press R to reset game", 32, GRAY), (10, stats_y + 30))
+
+def draw_scene_statistics(scene, games_played, ai_wins, ai_shot_counts):
+    """draw_statistics for a SceneRenderer frame"""
+    stats_text = statistics_text(games_played, ai_wins, ai_shot_counts)
+    scene.text('statistics', stats_text, 32, BLACK, (10, 600))
+    scene.text('statistics_help', stats_text and "Press R to reset game", 32, GRAY, (10, 630))
+
+
+class TextSprite(pygame.sprite.DirtySprite):
+    """A line of text that re-renders only when its text changes"""
+
+    def __init__(self):
+        super().__init__()
+        self.image = pygame.Surface((0, 0))
+        self.rect = self.image.get_rect()
+        self.content = None
+
+    def update_text(self, text, size, color, pos, center):
+        content = (text, size, color, pos, center)
+        if content != self.content:
+            self.content = content
+            self.image = render_text(text, size, color)
+            self.rect = self.image.get_rect(**{'midtop' if center else 'topleft': pos})
+            self.dirty = 1
+
+
+class BoardSprite(pygame.sprite.DirtySprite):
+    """Ships and hit/miss markers over one grid, redrawn only when they change"""
+
+    def __init__(self, x, y, cell_size):
+        super().__init__()
+        self.cell_size = cell_size
+        self.image = pygame.Surface((GRID_SIZE * cell_size, GRID_SIZE * cell_size), pygame.SRCALPHA)
+        self.rect = self.image.get_rect(topleft=(x, y))
+        self.content = None
+
+    def update_board(self, hits, misses, ships, ship_colors):
+        content = (frozenset(hits), frozenset(misses), tuple(map(tuple, ships)))
+        if content == self.content:
+            return
+        self.content = content
+        cell_size = self.cell_size
+        self.image.fill((0, 0, 0, 0))
+        for i, ship in enumerate(ships):
+            color = ship_colors[i % len(ship_colors)]
+            for r, c in ship:
+                pygame.draw.rect(self.image, color, (c * cell_size + 2, r * cell_size + 2, cell_size - 4, cell_size - 4))
+        draw_hits_misses(self.image, 0, 0, hits, misses, cell_size)
+        self.dirty = 1
+
+
+class SceneRenderer:
+    """Frame renderer that redraws and updates only what changed since the last frame
+
+    background holds everything static (fill colour, grids, titles). Each frame the
+    game loop calls board() and text() for what it wants shown and then draw(); text
+    not set in a frame is hidden. draw() pushes only the dirty rectangles to the
+    display, and nothing at all on frames where nothing changed.
+    """
+
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+        self.sprites = pygame.sprite.LayeredDirty()
+        self.sprites.clear(screen, background)
+        # Never fall back to redrawing the whole screen every frame on a slow frame
+        self.sprites.set_timing_threshold(float('inf'))
+        self.boards = {}
+        self.texts = {}
+        self.shown = set()
+        self.invalidate()
+
+    def invalidate(self):
+        """Redraw the whole screen on the next draw()"""
+        self.screen.blit(self.background, (0, 0))
+        self.sprites.repaint_rect(self.screen.get_rect())
+        self.full = True
+
+    def board(self, name, x, y, cell_size, hits, misses, ships=(), ship_colors=()):
+        sprite = self.boards.get(name)
+        if sprite is None:
+            sprite = self.boards[name] = BoardSprite(x, y, cell_size)
+            self.sprites.add(sprite, layer=0)
+        sprite.update_board(hits, misses, ships, ship_colors)
+
+    def text(self, name, text, size, color, pos, center=False):
+        """Show text this frame, with pos its top-left (or top-centre with center); None hides it"""
+        if text is None:
+            return
+        sprite = self.texts.get(name)
+        if sprite is None:
+            sprite = self.texts[name] = TextSprite()
+            self.sprites.add(sprite, layer=1)
+        sprite.update_text(text, size, color, pos, center)
+        if not sprite.visible:
+            sprite.visible = 1
+            sprite.dirty = 1
+        self.shown.add(name)
+
+    def draw(self):
+        """Draw the frame's changes and update the display, returns the updated rectangles"""
+        for name, sprite in self.texts.items():
+            if name not in self.shown and sprite.visible:
+                sprite.visible = 0
+                sprite.dirty = 1
+        self.shown.clear()
+        rects = self.sprites.draw(self.screen)
+        if self.full:
+            pygame.display.flip()
+            self.full = False
+        elif rects:
+            pygame.display.update(rects)
+        return rects
+
+class FramePacer:
+    """Game loop pacing - runs at up to max_fps while busy, otherwise sleeps until an event
+
+    An idle loop blocks in pygame.event.wait instead of redrawing at full rate, waking
+    after idle_timeout milliseconds at most. Event types in blocked (mouse motion by
+    default, which the games ignore) are not queued, so they do not wake it.
+    """
+
+    def __init__(self, max_fps=60, idle_timeout=1000, blocked=(pygame.MOUSEMOTION,)):
+        self.max_fps = max_fps
+        self.idle_timeout = idle_timeout
+        self.clock = pygame.time.Clock()
+        if blocked:
+            pygame.event.set_blocked(list(blocked))
+
+    def events(self, busy=False):
+        """Events for the next frame, after the frame time passes or, when idle, an event arrives"""
+        if busy:
+            self.clock.tick(self.max_fps)
+            return pygame.event.get()
+        # Keep the awaited event in front, posting it back would queue it behind newer ones
+        first = pygame.event.wait(self.idle_timeout)
+        self.clock.tick(self.max_fps)
+        if first.type == pygame.NOEVENT:
+            return pygame.event.get()
+        return [first] + pygame.event.get()
@@ -0,0 +1,286 @@
+"""
+Heatmap utilities for battleship - placement-count probability heatmaps
+
+Heatmaps are built from per-grid-size tables of placement start cells. The board is
+held as one byte lane per cell in a single Python int, so all placements of a ship
+length are filtered against the shot cells at once with a few shifts and ANDs, and
+the covered-cell counts are summed lane-wise with plain integer addition.
+
+An optional NumPy backend computes the same counts with cumulative-sum sliding
+windows and returns an ndarray. Select it with set_backend("numpy") or per call.
+
+IncrementalHeatmap keeps the counts between turns and only touches the placements
+through each new shot cell.
+"""
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+
+from bitboard_utils import placement_table
+from game_utils import GRID_SIZE
+
+# NumPy is optional and imported on first use, so the pure-Python backend never pays for it
+np = None
+
+BACKENDS = ("python", "numpy")
+_backend = "python"
+
+LANE_BITS = 8
+LANE_MAX = (1 << LANE_BITS) - 1
+_BITS_TO_LANES = bytes.maketrans(b'01', b'\x00\x01')
+
+@lru_cache(maxsize=None)
+def _full_lanes(n):
+    """Lane int with every cell set to 1"""
+    return int.from_bytes(b'\x01' * (n * n), 'little')
+
+@lru_cache(maxsize=None)
+def placement_starts(ship_len, horizontal, n=GRID_SIZE):
+    """Lane int marking every cell where a ship of ship_len can start without leaving the board"""
+    starts = 0
+    for row in range(n):
+        for col in range(n):
+            if (col if horizontal else row) + ship_len <= n:
+                starts |= 1 << (LANE_BITS * (row * n + col))
+    return starts
+
+def mask_to_lanes(blocked, n=GRID_SIZE):
+    """Spread a cell bitmask into one byte lane per cell"""
+    bits = format(blocked, f'0{n * n}b').encode().translate(_BITS_TO_LANES)
+    return int.from_bytes(bits, 'big')
+
+def occupied_to_lanes(occupied):
+    """Lane int of a list-of-lists occupied board (1 = shot)"""
+    return int.from_bytes(bytes(chain.from_iterable(occupied)), 'little')
+
+def lane_heatmap(blocked_lanes, ship_lengths, n=GRID_SIZE):
+    """Flat list of placement counts per cell, given the shot cells as a lane int"""
+    ship_lengths = Counter(ship_lengths)
+    # Every cell is covered by at most 2 * ship_len placements per ship
+    if 2 * sum(length * count for length, count in ship_lengths.items()) > LANE_MAX:
+        return _table_heatmap(blocked_lanes, ship_lengths, n)
+
+    free = _full_lanes(n) & ~blocked_lanes
+    total = 0
+    for ship_len, multiplicity in ship_lengths.items():
+        counts = 0
+        for horizontal, step in ((True, LANE_BITS), (False, LANE_BITS * n)):
+            # Keep starts whose next ship_len - 1 cells are also free
+            legal = free & placement_starts(ship_len, horizontal, n)
+            for k in range(1, ship_len):
+                legal &= free >> (step * k)
+            for k in range(ship_len):
+                counts += legal << (step * k)
+        total += counts * multiplicity
+    return list(total.to_bytes(n * n, 'little'))
+
+def _table_heatmap(blocked_lanes, ship_lengths, n):
+    """Placement-by-placement fallback for fleets whose counts would overflow a lane"""
+    blocked = 0
+    for idx, value in enumerate(blocked_lanes.to_bytes(n * n, 'little')):
+        if value:
+            blocked |= 1 << idx
+    flat = [0] * (n * n)
+    for ship_len, multiplicity in ship_lengths.items():
+        for mask, cells in placement_table(ship_len, n):
+            if mask & blocked == 0:
+                for idx in cells:
+                    flat[idx] += multiplicity
+    return flat
+
+def placement_heatmap(blocked, ship_lengths, n=GRID_SIZE):
+    """Count legal placements covering each cell for every ship length in ship_lengths
+
+    blocked is a bitmask of shot cells. Lengths that appear more than once (the two
+    3-length ships) are counted once and weighted by their multiplicity. Returns a
+    list-of-lists board with the same counts as create_board + mark_ship_positions.
+    """
+    flat = lane_heatmap(mask_to_lanes(blocked, n), ship_lengths, n)
+    return [flat[row * n:(row + 1) * n] for row in range(n)]
+
+@lru_cache(maxsize=None)
+def placements_through_cells(ship_len, n=GRID_SIZE):
+    """For every cell index, the indices into placement_table(ship_len, n) of placements covering it"""
+    through = [[] for _ in range(n * n)]
+    for p, (_, cells) in enumerate(placement_table(ship_len, n)):
+        for idx in cells:
+            through[idx].append(p)
+    return tuple(tuple(ps) for ps in through)
+
+@lru_cache(maxsize=None)
+def placement_lanes(ship_len, n=GRID_SIZE, lane_bits=LANE_BITS):
+    """Lane int of every entry of placement_table(ship_len, n), with 1 in each covered cell"""
+    return tuple(sum(1 << (lane_bits * idx) for idx in cells) for _, cells in placement_table(ship_len, n))
+
+class IncrementalHeatmap:
+    """Placement-count heatmap that is updated in place as shots and sinkings are recorded
+
+    Counts are held as a lane int, so dropping a placement is one subtraction. Recording
+    a shot touches only the placements through that cell, and recording a sunk ship
+    removes one ship's worth of its length. Both can be undone in reverse order, so a
+    search can walk a tree with one heatmap instead of copies.
+    """
+    __slots__ = ('n', 'lane_bits', 'lanes', 'remaining', 'alive', 'shots')
+
+    def __init__(self, ship_lengths, n=GRID_SIZE, shots=()):
+        self.n = n
+        self.remaining = Counter(ship_lengths)
+        # Wide enough lanes for the largest possible count, 2 * ship_len per ship
+        bound = 2 * sum(length * count for length, count in self.remaining.items())
+        self.lane_bits = LANE_BITS * max(1, -(-bound.bit_length() // LANE_BITS))
+        # One flag per entry of placement_table(ship_len, n), cleared once a shot blocks it
+        self.alive = {ship_len: bytearray(b'\x01') * len(placement_table(ship_len, n)) for ship_len in self.remaining}
+        self.shots = set()
+        self.lanes = 0
+        for ship_len, multiplicity in self.remaining.items():
+            self.lanes += multiplicity * sum(placement_lanes(ship_len, n, self.lane_bits))
+        for row, col in shots:
+            self.record_shot(row, col)
+
+    def record_shot(self, row, col):
+        """Block a hit or missed cell, returns the removed placements for undo_shot"""
+        idx = row * self.n + col
+        removed = []
+        lanes = self.lanes
+        self.shots.add((row, col))
+        for ship_len, multiplicity in self.remaining.items():
+            alive = self.alive[ship_len]
+            masks = placement_lanes(ship_len, self.n, self.lane_bits)
+            dropped = 0
+            for p in placements_through_cells(ship_len, self.n)[idx]:
+                if alive[p]:
+                    alive[p] = 0
+                    removed.append((ship_len, p))
+                    dropped += masks[p]
+            lanes -= multiplicity * dropped
+        self.lanes = lanes
+        return removed
+
+    def undo_shot(self, row, col, removed):
+        """Revert record_shot, given its return value"""
+        restored = {}
+        self.shots.discard((row, col))
+        for ship_len, p in removed:
+            self.alive[ship_len][p] = 1
+            restored[ship_len] = restored.get(ship_len, 0) + placement_lanes(ship_len, self.n, self.lane_bits)[p]
+        lanes = self.lanes
+        for ship_len, added in restored.items():
+            lanes += self.remaining[ship_len] * added
+        self.lanes = lanes
+
+    def record_sunk(self, ship_len):
+        """Remove one ship of ship_len from the counts"""
+        self._adjust_length(ship_len, -1)
+
+    def undo_sunk(self, ship_len):
+        """Revert record_sunk"""
+        self._adjust_length(ship_len, 1)
+
+    def _adjust_length(self, ship_len, delta):
+        alive = self.alive[ship_len]
+        masks = placement_lanes(ship_len, self.n, self.lane_bits)
+        self.lanes += delta * sum(mask for p, mask in enumerate(masks) if alive[p])
+        self.remaining[ship_len] += delta
+        if self.remaining[ship_len] == 0:
+            del self.remaining[ship_len]
+
+    def update(self, shots, ship_lengths):
+        """Catch up with the current shot set and remaining ship lengths"""
+        for row, col in shots - self.shots:
+            self.record_shot(row, col)
+        sunk = self.remaining - Counter(ship_lengths)
+        for ship_len, count in sunk.items():
+            for _ in range(count):
+                self.record_sunk(ship_len)
+
+    def copy(self):
+        """Independent copy of the heatmap state"""
+        clone = IncrementalHeatmap.__new__(IncrementalHeatmap)
+        clone.n = self.n
+        clone.lane_bits = self.lane_bits
+        clone.lanes = self.lanes
+        clone.remaining = self.remaining.copy()
+        clone.alive = {ship_len: alive[:] for ship_len, alive in self.alive.items()}
+        clone.shots = set(self.shots)
+        return clone
+
+    def flat(self):
+        """Counts as a flat list, cell index row * n + col"""
+        width = self.lane_bits // 8
+        raw = self.lanes.to_bytes(self.n * self.n * width, 'little')
+        if width == 1:
+            return list(raw)
+        return [int.from_bytes(raw[i:i + width], 'little') for i in range(0, len(raw), width)]
+
+    def board(self):
+        """Counts as a list-of-lists board, like compute_heatmap"""
+        n = self.n
+        flat = self.flat()
+        return [flat[row * n:(row + 1) * n] for row in range(n)]
+
+def _import_numpy():
+    """The numpy module, imported on first call"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("The numpy heatmap backend requires NumPy (pip install numpy)") from None
+        np = numpy
+    return np
+
+def numpy_heatmap(occupied, ship_lengths):
+    """Placement-count heatmap as an int ndarray, computed with sliding-window sums
+
+    For each length, a window sum over the blocked cells finds the legal starts, and a
+    second window sum over the legal starts gives how many placements cover each cell.
+    Vertical placements are handled as rows of the transposed board.
+    """
+    _import_numpy()
+    blocked = np.asarray(occupied, dtype=bool)
+    n = blocked.shape[0]
+    # Rows of the board and rows of its transpose, so one pass covers both orientations
+    boards = np.stack((blocked, blocked.T))
+    blocked_sums = np.zeros((2, n, n + 1), dtype=np.int64)
+    np.cumsum(boards, axis=2, out=blocked_sums[:, :, 1:])
+    cells = np.arange(n)
+    counts = np.zeros((2, n, n), dtype=np.int64)
+    for ship_len, multiplicity in Counter(ship_lengths).items():
+        if ship_len > n:
+            continue
+        starts = n - ship_len + 1
+        # A start is legal when its ship_len window holds no blocked cells
+        legal = blocked_sums[:, :, ship_len:] == blocked_sums[:, :, :starts]
+        # Each cell is covered by the legal starts in [lo, hi)
+        legal_sums = np.zeros((2, n, starts + 1), dtype=np.int64)
+        np.cumsum(legal, axis=2, out=legal_sums[:, :, 1:])
+        lo = np.maximum(cells - ship_len + 1, 0)
+        hi = np.minimum(cells, starts - 1) + 1
+        counts += multiplicity * (legal_sums[:, :, hi] - legal_sums[:, :, lo])
+    return counts[0] + counts[1].T
+
+def set_backend(backend):
+    """Select the default heatmap backend - "python" or "numpy" """
+    global _backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown heatmap backend {backend!r}, expected one of {BACKENDS}")
+    if backend == "numpy":
+        _import_numpy()
+    _backend = backend
+
+def get_backend():
+    """Name of the default heatmap backend"""
+    return _backend
+
+def compute_heatmap(occupied, ship_lengths, backend=None):
+    """Placement-count heatmap for a list-of-lists occupied board
+
+    Returns a list-of-lists board from the pure-Python backend, or an ndarray from the
+    numpy backend. Both index as heatmap[row][col] and hold identical counts.
+    """
+    backend = backend or _backend
+    if backend == "numpy":
+        return numpy_heatmap(occupied, ship_lengths)
+    n = len(occupied)
+    flat = lane_heatmap(occupied_to_lanes(occupied), ship_lengths, n)
+    return [flat[row * n:(row + 1) * n] for row in range(n)]
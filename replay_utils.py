@@ -0,0 +1,237 @@
+"""
+Replay utilities for battleship - append-only binary logs of played games
+
+A log file starts with a 10-byte header and is followed by one record per game:
+
+    record header  size, seed, grid size, ships, shots, strategy name and options lengths
+    strategy name  ASCII
+    options        the engine's keyword arguments (samples, max_depth, ...) as JSON
+    fleet          ship sizes, then one placement index per ship (see fleet_utils)
+    moves          per shot: cell index, hit/sunk flags, compute time in microseconds
+
+Records only ever get appended, and each one starts with its own size, so a
+reader can stream a log of millions of games or skip to game i without decoding
+the games before it. A 45-shot game takes about 300 bytes.
+
+replay_game plays a logged game again through its engine, with the logged
+options and without pygame, and reports the first move where the engine no longer
+makes the logged shot.
+
+Usage:
+    python tournament.py --games 1000 --replay games.log heatmap
+    python replay_utils.py games.log --game 17 --verbose
+"""
+import argparse
+import json
+import random
+import struct
+from collections import namedtuple
+
+from fleet_utils import fleet_indices, fleet_ships
+from game_utils import GRID_SIZE, GameState
+from strategies import STRATEGIES, new_game_options
+
+MAGIC = b'BSREPLAY'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sH')
+# record size in bytes, seed, grid size, ships per fleet, shots, strategy name length, options length
+GAME_HEADER = struct.Struct('<IqBBHBH')
+# cell index, flags, compute time in microseconds
+MOVE = struct.Struct('<BBI')
+HIT = 1
+SUNK = 2
+
+# options is the dict of engine keyword arguments the game was played with,
+# moves is a list of (row, col, hit, sunk, seconds) per shot
+ReplayGame = namedtuple('ReplayGame', ['strategy', 'seed', 'ships', 'moves', 'options'])
+
+def encode_game(strategy, seed, ships, moves, options=None, n=GRID_SIZE):
+    """One game as a log record, options being JSON-serialisable engine keyword arguments"""
+    if n * n > 256:
+        raise ValueError(f"Cells of a {n}x{n} board do not fit in a byte")
+    name = strategy.encode('ascii')
+    encoded_options = json.dumps(options or {}, sort_keys=True, separators=(',', ':')).encode('ascii')
+    body = bytearray(name)
+    body += encoded_options
+    body += bytes(len(ship) for ship in ships)
+    body += bytes(fleet_indices(ships, n))
+    for row, col, hit, sunk, seconds in moves:
+        body += MOVE.pack(row * n + col, (HIT if hit else 0) | (SUNK if sunk else 0), round(seconds * 1e6))
+    header = GAME_HEADER.pack(GAME_HEADER.size + len(body), seed, n, len(ships), len(moves), len(name),
+                              len(encoded_options))
+    return header + body
+
+def decode_game(record):
+    """ReplayGame of a log record, as written by encode_game"""
+    _, seed, n, width, shots, name_len, options_len = GAME_HEADER.unpack_from(record)
+    offset = GAME_HEADER.size
+    strategy = bytes(record[offset:offset + name_len]).decode('ascii')
+    offset += name_len
+    options = json.loads(bytes(record[offset:offset + options_len]))
+    offset += options_len
+    sizes = tuple(record[offset:offset + width])
+    indices = tuple(record[offset + width:offset + 2 * width])
+    offset += 2 * width
+    moves = []
+    for cell, flags, micros in MOVE.iter_unpack(record[offset:offset + shots * MOVE.size]):
+        row, col = divmod(cell, n)
+        moves.append((row, col, bool(flags & HIT), bool(flags & SUNK), micros / 1e6))
+    return ReplayGame(strategy, seed, fleet_ships(indices, sizes, n), moves, options)
+
+def _check_header(data, path):
+    if len(data) < FILE_HEADER.size:
+        raise ValueError(f"{path} is not a replay log")
+    magic, version = FILE_HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a replay log")
+    if version != VERSION:
+        raise ValueError(f"{path} is replay log version {version}, expected {VERSION}")
+
+class ReplayWriter:
+    """Appends game records to a log file through a write buffer
+
+    An existing log is appended to, a missing one is created. Records reach the
+    file when the buffer fills and on flush() or close().
+    """
+    __slots__ = ('path', 'file', 'games')
+
+    def __init__(self, path, buffer_size=1 << 20):
+        self.path = path
+        self.games = 0
+        self.file = open(path, 'ab', buffering=buffer_size)
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        else:
+            with open(path, 'rb') as existing:
+                data = existing.read(FILE_HEADER.size)
+            try:
+                _check_header(data, path)
+            except ValueError:
+                self.file.close()
+                raise
+
+    def write_game(self, strategy, seed, ships, moves, options=None):
+        """Append one game, moves being its (row, col, hit, sunk, seconds) shots in order
+
+        options are the engine keyword arguments the game was played with, which
+        replay_game passes to the engine again.
+        """
+        self.file.write(encode_game(strategy, seed, ships, moves, options))
+        self.games += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ReplayReader:
+    """Streams the games of a log file in the order they were written"""
+    __slots__ = ('path', 'file')
+
+    def __init__(self, path, buffer_size=1 << 20):
+        self.path = path
+        self.file = open(path, 'rb', buffering=buffer_size)
+        try:
+            _check_header(self.file.read(FILE_HEADER.size), path)
+        except ValueError:
+            self.file.close()
+            raise
+
+    def _records(self):
+        """Raw records from the first game on"""
+        read = self.file.read
+        self.file.seek(FILE_HEADER.size)
+        while True:
+            header = read(GAME_HEADER.size)
+            if not header:
+                return
+            if len(header) < GAME_HEADER.size:
+                raise ValueError(f"{self.path} ends in a truncated record")
+            size = GAME_HEADER.unpack_from(header)[0]
+            body = read(size - GAME_HEADER.size)
+            if len(body) < size - GAME_HEADER.size:
+                raise ValueError(f"{self.path} ends in a truncated record")
+            yield header + body
+
+    def __iter__(self):
+        for record in self._records():
+            yield decode_game(record)
+
+    def game(self, index):
+        """Game number index of the log, skipping the records before it unread"""
+        if index < 0:
+            raise IndexError(f"game {index} out of range for {self.path}")
+        self.file.seek(FILE_HEADER.size)
+        for _ in range(index + 1):
+            header = self.file.read(GAME_HEADER.size)
+            if len(header) < GAME_HEADER.size:
+                raise IndexError(f"{self.path} holds fewer than {index + 1} games")
+            size = GAME_HEADER.unpack_from(header)[0]
+            self.file.seek(size - GAME_HEADER.size, 1)
+        self.file.seek(-size, 1)
+        record = self.file.read(size)
+        if len(record) < size:
+            raise ValueError(f"{self.path} ends in a truncated record")
+        return decode_game(record)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def replay_game(game, verbose=False, **options):
+    """Play a logged game again through its engine, returns the first diverging move or None
+
+    The engine gets the logged seed, the logged options and fresh per-game state,
+    as in tournament.py, so the game replays shot for shot; options passed here
+    override the logged ones. Options that depend on wall-clock time (time_budget,
+    time_limit) or a worker pool may not replay. With verbose, the engine prints its
+    debug output for every move.
+    """
+    turn = STRATEGIES[game.strategy]
+    options = {**new_game_options(game.strategy), **game.options, **options}
+    random.seed(game.seed)
+    state = GameState(game.ships)
+    for index, (row, col, _, _, _) in enumerate(game.moves):
+        turn(game.ships, state.occupied, state.current_hits, state.hits, state.misses, game=state,
+             verbose=verbose, **options)
+        if state.last_shot is None or state.last_shot[:2] != (row, col):
+            return index
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Show a logged battleship game and replay it through its engine")
+    parser.add_argument("path", help="replay log file")
+    parser.add_argument("--game", type=int, default=0, help="game number in the log")
+    parser.add_argument("--verbose", action="store_true", help="print the engine's debug output while replaying")
+    args = parser.parse_args()
+
+    with ReplayReader(args.path) as reader:
+        try:
+            game = reader.game(args.game)
+        except IndexError as error:
+            parser.error(str(error))
+    settings = ''.join(f", {key}={value}" for key, value in sorted(game.options.items()))
+    print(f"Game {args.game}: {game.strategy}{settings}, seed {game.seed}, {len(game.moves)} shots")
+    for number, (row, col, hit, sunk, seconds) in enumerate(game.moves, 1):
+        result = "sunk" if sunk else "hit" if hit else "miss"
+        print(f"  {number:3}. ({row}, {col}) {result:4} {seconds * 1000:8.2f} ms")
+    diverged = replay_game(game, verbose=args.verbose)
+    if diverged is None:
+        print("Replay matches the log")
+    else:
+        print(f"Replay diverges at shot {diverged + 1}")
+
+if __name__ == "__main__":
+    main()
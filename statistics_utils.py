@@ -1,6 +1,8 @@
 """
 Statistics utilities for battleship - game tracking and reset functions
 """
+from collections import Counter
+
 from game_utils import generate_ships, GRID_SIZE
 
 def create_statistics_globals():
@@ -59,4 +61,23 @@ def update_statistics(stats, enemy_hits, enemy_misses, winner):
         print(f"\n=== GAME {stats['games_played']} COMPLETE ===")
         print(f"Winner: {winner} (Player won!)")
         print(f"AI shots taken: {ai_shots_this_game}")
-        print("=====================================\n")
\ No newline at end of file
+        print("=====================================\n")
+
+def summarize_shot_counts(shot_counts):
+    """Summarize per-game shot counts - returns a dict of distribution statistics"""
+    counts = sorted(shot_counts)
+    n = len(counts)
+    if n == 0:
+        return {'games': 0}
+    mean = sum(counts) / n
+    variance = sum((c - mean) ** 2 for c in counts) / n
+    return {
+        'games': n,
+        'mean': mean,
+        'stdev': variance ** 0.5,
+        'min': counts[0],
+        'max': counts[-1],
+        # Nearest-rank percentiles
+        'percentiles': {p: counts[min(n - 1, (p * n) // 100)] for p in (10, 25, 50, 75, 90, 99)},
+        'histogram': dict(sorted(Counter(counts).items()))
+    }
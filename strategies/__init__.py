@@ -0,0 +1,26 @@
+"""
+AI strategies for battleship - headless engines shared by the game windows and batch tools
+"""
+from game_utils import SHIP_SIZES
+from heatmap_utils import IncrementalHeatmap
+from strategies.heatmap import ai_turn as heatmap_turn
+from strategies.montecarlo import ParticleSet, monte_carlo_ai_turn
+from strategies.expectimax import TranspositionTable, ai_turn as expectimax_turn
+
+# Strategy name -> turn function with the shared (ships, occupied, current_hits, enemy_hits, enemy_misses) signature
+STRATEGIES = {
+    'heatmap': heatmap_turn,
+    'montecarlo': monte_carlo_ai_turn,
+    'expectimax': expectimax_turn,
+}
+
+
+def new_game_options(strategy):
+    """Fresh per-game keyword arguments for a strategy's turn function"""
+    if strategy == 'heatmap':
+        return {'heatmap_state': IncrementalHeatmap(SHIP_SIZES)}
+    if strategy == 'montecarlo':
+        return {'particles': ParticleSet(SHIP_SIZES)}
+    if strategy == 'expectimax':
+        return {'table': TranspositionTable()}
+    return {}
@@ -0,0 +1,504 @@
+"""
+Expectimax AI - depth-limited game tree search over hit/miss outcomes of the top heatmap cells
+"""
+import math
+import random
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from functools import lru_cache
+
+from game_utils import GRID_SIZE, SHIP_SIZES, GameState, enhanced_target_shot_multi_ship, pool_workers
+from heatmap_utils import IncrementalHeatmap
+
+# AI parameters
+MAX_DEPTH = 3     # max search depth
+TOP_K = 8         # expand only top-k candidate moves
+GAMMA = 0.9       # discount factor
+TABLE_SIZE = 1 << 16  # transposition table entries kept before LRU eviction
+PRUNE_MARGIN = 1e-9   # slack on pruning thresholds so float rounding never cuts a tie
+
+# Zobrist keys: one random 64-bit key per (cell, hit) and (cell, miss), and per sunk ship
+_zobrist_rng = random.Random(0x5EA)
+ZOBRIST_HIT = [_zobrist_rng.getrandbits(64) for _ in range(GRID_SIZE * GRID_SIZE)]
+ZOBRIST_MISS = [_zobrist_rng.getrandbits(64) for _ in range(GRID_SIZE * GRID_SIZE)]
+ZOBRIST_SUNK = [_zobrist_rng.getrandbits(64) for _ in range(len(SHIP_SIZES))]
+
+
+class TranspositionTable:
+    """Bounded LRU cache of searched positions, keyed by (Zobrist key, depth)
+
+    Entries hold (value, best move, exact); exact is False when a pruned search only
+    proved the value is at most the stored one. Only exact-depth matches are returned,
+    since the discounted value of a position depends on how deep below it was searched.
+    """
+    __slots__ = ('capacity', 'entries', 'probes', 'hits', 'stores', 'evictions')
+
+    def __init__(self, capacity=TABLE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def get(self, key, depth):
+        """(value, best move, exact) for a position searched to depth, or None"""
+        self.probes += 1
+        entry = self.entries.get((key, depth))
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end((key, depth))
+        return entry
+
+    def store(self, key, depth, value, move, exact=True):
+        self.stores += 1
+        self.entries[(key, depth)] = (value, move, exact)
+        self.entries.move_to_end((key, depth))
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def best_move(self, key, depth):
+        """Stored best move for a position at depth, for move ordering - not counted as a probe"""
+        entry = self.entries.get((key, depth))
+        return entry[1] if entry is not None else None
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def counters(self):
+        return {'size': len(self.entries), 'probes': self.probes, 'hits': self.hits, 'hit_rate': self.hit_rate(),
+                'stores': self.stores, 'evictions': self.evictions}
+
+
+def zobrist_key(ships, enemy_hits, enemy_misses):
+    """Zobrist hash of the hit/miss state and the set of sunk ships"""
+    key = 0
+    for r, c in enemy_hits:
+        key ^= ZOBRIST_HIT[r * GRID_SIZE + c]
+    for r, c in enemy_misses:
+        key ^= ZOBRIST_MISS[r * GRID_SIZE + c]
+    for i, ship in enumerate(ships):
+        if all(coord in enemy_hits for coord in ship):
+            key ^= ZOBRIST_SUNK[i]
+    return key
+
+
+def heuristic_value(occupied, current_hits, enemy_hits, enemy_misses):
+    # basic heuristic = number of hits minus misses
+    return len(enemy_hits) - 0.2*len(enemy_misses)
+
+class SearchState:
+    """The one mutable position an expectimax search walks, with make/unmake moves
+
+    apply() shoots a cell as a hit or a miss and pushes what it changed onto the undo
+    stack; undo() pops and reverts it. The heatmap, Zobrist key and per-ship hit
+    counters are updated in place, so a node allocates only its undo record. Leaf
+    moves pass heat=False, as leaves are scored without a heatmap.
+    """
+    __slots__ = ('ships', 'cell_ship', 'left', 'sunk', 'occupied', 'hits', 'misses', 'heat', 'key', 'stack')
+
+    def __init__(self, ships, occupied, enemy_hits, enemy_misses):
+        self.ships = ships
+        self.cell_ship = {coord: i for i, ship in enumerate(ships) for coord in ship}
+        # Unhit cells per ship, a ship is sunk at 0
+        self.left = [sum(coord not in enemy_hits for coord in ship) for ship in ships]
+        self.sunk = self.left.count(0)
+        self.occupied = [row[:] for row in occupied]
+        self.hits = set(enemy_hits)
+        self.misses = set(enemy_misses)
+        shots = [(r, c) for r in range(GRID_SIZE) for c in range(GRID_SIZE) if occupied[r][c]]
+        self.heat = IncrementalHeatmap([len(ship) for i, ship in enumerate(ships) if self.left[i]], shots=shots)
+        self.key = zobrist_key(ships, enemy_hits, enemy_misses)
+        self.stack = []
+
+    def all_sunk(self):
+        return self.sunk == len(self.ships)
+
+    def apply(self, r, c, hit, heat=True):
+        """Shoot (r, c) with the given outcome"""
+        removed = self.heat.record_shot(r, c) if heat else None
+        self.occupied[r][c] = 1
+        sunk_ship = None
+        if hit:
+            self.hits.add((r, c))
+            self.key ^= ZOBRIST_HIT[r*GRID_SIZE + c]
+            i = self.cell_ship.get((r, c))
+            if i is not None:
+                self.left[i] -= 1
+                if self.left[i] == 0:
+                    sunk_ship = i
+                    self.sunk += 1
+                    self.key ^= ZOBRIST_SUNK[i]
+                    if heat:
+                        self.heat.record_sunk(len(self.ships[i]))
+        else:
+            self.misses.add((r, c))
+            self.key ^= ZOBRIST_MISS[r*GRID_SIZE + c]
+        self.stack.append((r, c, hit, removed, sunk_ship))
+
+    def undo(self):
+        """Revert the last apply()"""
+        r, c, hit, removed, sunk_ship = self.stack.pop()
+        if hit:
+            i = self.cell_ship.get((r, c))
+            if i is not None:
+                if sunk_ship is not None:
+                    if removed is not None:
+                        self.heat.undo_sunk(len(self.ships[i]))
+                    self.key ^= ZOBRIST_SUNK[i]
+                    self.sunk -= 1
+                self.left[i] += 1
+            self.key ^= ZOBRIST_HIT[r*GRID_SIZE + c]
+            self.hits.discard((r, c))
+        else:
+            self.key ^= ZOBRIST_MISS[r*GRID_SIZE + c]
+            self.misses.discard((r, c))
+        self.occupied[r][c] = 0
+        if removed is not None:
+            self.heat.undo_shot(r, c, removed)
+
+    def value(self):
+        return heuristic_value(self.occupied, (), self.hits, self.misses)
+
+
+class SearchTimeout(Exception):
+    """Raised inside expectimax when the search deadline passes"""
+
+
+def candidate_moves(state):
+    """Top TOP_K unshot cells by heatmap count as (r, c, count), hottest first"""
+    heatmap = state.heat.flat()
+    occupied = state.occupied
+    candidates = [(r,c,heatmap[r*GRID_SIZE + c]) for r in range(GRID_SIZE) for c in range(GRID_SIZE) if occupied[r][c]==0]
+    candidates.sort(key=lambda x: x[2], reverse=True)
+    return candidates[:TOP_K]
+
+@lru_cache(maxsize=None)
+def value_upper_bound(depth, hits, misses):
+    """Largest value a search depth shots deep can return from hits hits and misses misses
+
+    A chance node is a p-weighted mix of its hit and miss child, so its value is at
+    most the better of 1 + GAMMA * (hit child bound) and GAMMA * (miss child bound).
+    """
+    bound = hits - 0.2*misses
+    if depth > 0:
+        bound = max(bound,
+                    1 + GAMMA*value_upper_bound(depth-1, hits+1, misses),
+                    GAMMA*value_upper_bound(depth-1, hits, misses+1))
+    return bound
+
+def expectimax(state, depth, table=None, deadline=None, alpha=-math.inf, prune=True, stats=None):
+    """(value, best move) of a SearchState searched depth shots ahead, state is restored on return
+
+    With a deadline (time.perf_counter() value), SearchTimeout is raised once it passes
+    and the state is left mid-search for the caller to unwind.
+
+    With prune, chance nodes are cut Star1-style: once value_upper_bound shows a
+    candidate cannot beat the best so far (or alpha, the most the caller can use), its
+    remaining outcomes are skipped. A returned value at or below alpha is then only an
+    upper bound; above alpha it is exact. stats, a dict, counts 'nodes' searched and
+    'pruned' subtrees.
+    """
+    if stats is not None:
+        stats['nodes'] = stats.get('nodes', 0) + 1
+    if depth == 0 or state.all_sunk():
+        return state.value(), None
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout
+
+    # Positions reached by different shot orders share a key, so they are searched once
+    if table is not None:
+        entry = table.get(state.key, depth)
+        if entry is not None and (entry[2] or entry[0] <= alpha):
+            return entry[0], entry[1]
+
+    candidates = candidate_moves(state)
+    if not candidates:
+        return state.value(), None
+    max_heat = candidates[0][2] or 1
+
+    # Search the shallower iteration's best move first; ties still go to the hotter cell
+    order = list(enumerate(candidates))
+    hint = table.best_move(state.key, depth - 1) if table is not None else None
+    if hint is not None:
+        order.sort(key=lambda item: item[1][:2] != hint)
+
+    best_val = -1e9
+    best_move = None
+    best_rank = len(candidates)
+    for rank, (r,c,val) in order:
+        threshold = max(alpha, best_val) - PRUNE_MARGIN if prune else -math.inf
+        exp_val = candidate_value(state, r, c, val / max_heat, depth, table, deadline, threshold, prune, stats)
+        if exp_val > best_val or (exp_val == best_val and rank < best_rank):
+            best_val = exp_val
+            best_move = (r,c)
+            best_rank = rank
+
+    if table is not None:
+        table.store(state.key, depth, best_val, best_move, best_val > alpha)
+    return best_val, best_move
+
+def candidate_value(state, r, c, p_hit, depth, table=None, deadline=None, threshold=-math.inf, prune=True, stats=None):
+    """Expected value of shooting (r, c) with hit probability p_hit, searching depth - 1 shots after it
+
+    One candidate's chance node of an expectimax search. With prune, an outcome is
+    skipped, or searched with a raised alpha, once value_upper_bound shows the
+    candidate cannot beat threshold; a value at or below threshold is then only an
+    upper bound.
+    """
+    heat = depth > 1
+    if not prune:
+        state.apply(r, c, True, heat)
+        val_hit,_ = expectimax(state, depth-1, table, deadline, prune=False, stats=stats)
+        state.undo()
+        state.apply(r, c, False, heat)
+        val_miss,_ = expectimax(state, depth-1, table, deadline, prune=False, stats=stats)
+        state.undo()
+        return p_hit * (1 + GAMMA*val_hit) + (1-p_hit) * (GAMMA*val_miss)
+
+    # Upper bounds on the weighted hit and miss terms, tightened as each is searched
+    hit_term, miss_term = outcome_bounds(state, p_hit, depth)
+    # Likelier outcome first, its value tightens the bound on the other soonest
+    for hit in ((True, False) if p_hit >= 0.5 else (False, True)):
+        weight = p_hit if hit else 1 - p_hit
+        if weight == 0:
+            # A zero-weight outcome adds exactly 0 to the expected value
+            if hit:
+                hit_term = 0.0
+            else:
+                miss_term = 0.0
+            continue
+        if hit_term + miss_term < threshold:
+            if stats is not None:
+                stats['pruned'] = stats.get('pruned', 0) + 1
+            continue
+        child_alpha = outcome_alpha(hit, p_hit, threshold, miss_term if hit else hit_term)
+        state.apply(r, c, hit, heat)
+        child_val,_ = expectimax(state, depth-1, table, deadline, child_alpha, True, stats)
+        state.undo()
+        if hit:
+            hit_term = p_hit * (1 + GAMMA*child_val)
+        else:
+            miss_term = (1-p_hit) * (GAMMA*child_val)
+    return hit_term + miss_term
+
+def outcome_bounds(state, p_hit, depth):
+    """Upper bounds on the weighted hit and miss terms of a candidate searched depth shots deep"""
+    hits, misses = len(state.hits), len(state.misses)
+    return (p_hit * (1 + GAMMA*value_upper_bound(depth-1, hits+1, misses)),
+            (1-p_hit) * (GAMMA*value_upper_bound(depth-1, hits, misses+1)))
+
+def outcome_alpha(hit, p_hit, threshold, other_term):
+    """The least an outcome's value must reach for its candidate to beat threshold, given the other weighted term"""
+    if hit:
+        return ((threshold - other_term) / p_hit - 1) / GAMMA - PRUNE_MARGIN
+    return (threshold - other_term) / (1 - p_hit) / GAMMA - PRUNE_MARGIN
+
+def search_candidate(ships, occupied, enemy_hits, enemy_misses, shot, p_hit, depth, threshold, prune=True):
+    """candidate_value of shot from the given position, run in pool workers with their own state and table"""
+    state = SearchState(ships, occupied, enemy_hits, enemy_misses)
+    return candidate_value(state, shot[0], shot[1], p_hit, depth, TranspositionTable(), None, threshold, prune)
+
+def search_outcomes(ships, occupied, enemy_hits, enemy_misses, shot, outcomes, depth, alphas=None, prune=True):
+    """Values of the positions after shot for each outcome (True = hit), searched depth further
+
+    Runs in pool workers, each task with its own search state and transposition table.
+    alphas, one per outcome, are the alpha each outcome's search starts from.
+    """
+    state = SearchState(ships, occupied, enemy_hits, enemy_misses)
+    table = TranspositionTable()
+    values = []
+    for hit, alpha in zip(outcomes, alphas or [-math.inf] * len(outcomes)):
+        state.apply(shot[0], shot[1], hit, depth > 0)
+        values.append(expectimax(state, depth, table, alpha=alpha, prune=prune)[0])
+        state.undo()
+    return values
+
+def parallel_expectimax(pool, ships, occupied, enemy_hits, enemy_misses, depth, split_outcomes=False, table=None,
+                        prune=True, window=None, stats=None):
+    """expectimax with the root candidates searched concurrently on an Executor
+
+    The first candidate (table's best move from the last search, else the hottest
+    cell) is searched here with table, and its value is the first alpha the pool
+    tasks start from. At most window candidates (default: one per pool worker) are in
+    flight, and each new one is submitted with the best value found so far, so the
+    tasks prune like the serial search does. A candidate is one task, or one per outcome
+    with split_outcomes. Results are merged exactly as the serial search does, so
+    the chosen move and value are the same. stats, a dict, counts root 'tasks' and
+    'pruned' candidates.
+    """
+    state = SearchState(ships, occupied, enemy_hits, enemy_misses)
+    if depth == 0 or state.all_sunk():
+        return state.value(), None
+    if table is None:
+        table = TranspositionTable()
+    entry = table.get(state.key, depth)
+    if entry is not None and entry[2]:
+        return entry[0], entry[1]
+    candidates = candidate_moves(state)
+    if not candidates:
+        return state.value(), None
+    max_heat = candidates[0][2] or 1
+    stats = {} if stats is None else stats
+    stats.setdefault('tasks', 0)
+    stats.setdefault('pruned', 0)
+
+    order = list(enumerate(candidates))
+    hint = table.best_move(state.key, depth - 1)
+    if hint is not None:
+        order.sort(key=lambda item: item[1][:2] != hint)
+
+    rank, (r,c,val) = order[0]
+    best_val = candidate_value(state, r, c, val / max_heat, depth, table, prune=prune)
+    best_move = (r,c)
+    best_rank = rank
+
+    window = window or pool_workers(pool)
+    remaining = deque(order[1:])
+    running = {}
+    while remaining or running:
+        while remaining and len(running) < window:
+            rank, (r,c,val) = remaining.popleft()
+            p_hit = val / max_heat
+            threshold = best_val - PRUNE_MARGIN if prune else -math.inf
+            if not split_outcomes:
+                futures = [pool.submit(search_candidate, ships, occupied, enemy_hits, enemy_misses, (r,c), p_hit, depth,
+                                       threshold, prune)]
+                running[rank] = ((r,c), p_hit, None, futures)
+                stats['tasks'] += 1
+                continue
+            hit_term, miss_term = outcome_bounds(state, p_hit, depth)
+            if prune and hit_term + miss_term < threshold:
+                stats['pruned'] += 1
+                continue
+            outcomes = [hit for hit in (True, False) if (p_hit if hit else 1 - p_hit) > 0]
+            futures = []
+            for hit in outcomes:
+                alpha = outcome_alpha(hit, p_hit, threshold, miss_term if hit else hit_term) if prune else -math.inf
+                futures.append(pool.submit(search_outcomes, ships, occupied, enemy_hits, enemy_misses, (r,c), (hit,),
+                                           depth-1, (alpha,), prune))
+            running[rank] = ((r,c), p_hit, outcomes, futures)
+            stats['tasks'] += len(futures)
+
+        wait([future for *_, futures in running.values() for future in futures], return_when=FIRST_COMPLETED)
+        for rank, (move, p_hit, outcomes, futures) in list(running.items()):
+            if not all(future.done() for future in futures):
+                continue
+            del running[rank]
+            if outcomes is None:
+                exp_val = futures[0].result()
+            else:
+                exp_val = 0.0
+                for hit, future in zip(outcomes, futures):
+                    value = future.result()[0]
+                    exp_val += p_hit * (1 + GAMMA*value) if hit else (1-p_hit) * (GAMMA*value)
+            if exp_val > best_val or (exp_val == best_val and rank < best_rank):
+                best_val = exp_val
+                best_move = move
+                best_rank = rank
+
+    table.store(state.key, depth, best_val, best_move)
+    return best_val, best_move
+
+def iterative_deepening(state, max_depth, time_limit, table=None):
+    """Search depth 1, 2, ... max_depth until time_limit seconds pass
+
+    Returns (value, best move, depth) of the deepest completed iteration. Depth 1 is
+    always completed, so a move is returned however short the time limit.
+    """
+    if table is None:
+        table = TranspositionTable()
+    deadline = time.perf_counter() + time_limit
+    value, move = expectimax(state, 1, table)
+    completed = 1
+    base = len(state.stack)
+    for depth in range(2, max_depth + 1):
+        try:
+            value, move = expectimax(state, depth, table, deadline)
+        except SearchTimeout:
+            # Unwind the moves the interrupted iteration left applied
+            while len(state.stack) > base:
+                state.undo()
+            break
+        completed = depth
+    return value, move, completed
+
+def ai_turn(ships, occupied, current_hits, enemy_hits, enemy_misses, max_depth=MAX_DEPTH, verbose=False, table=None,
+            time_limit=None, pool=None, split_outcomes=False, game=None):
+    """Perform one expectimax AI shot, returns the new mode
+
+    Hunt moves search with a transposition table. Pass one table for a whole game so
+    each search starts from the previous one's entries: the position after the last
+    shot was already searched one level shallower, and its best moves order the new
+    search. Without table a fresh one is used for this move. With time_limit (seconds) the
+    hunt search deepens iteratively up to max_depth and stops at the deadline. With
+    pool, a concurrent.futures Executor, a fixed-depth hunt search splits its root
+    candidates across the pool instead (see parallel_expectimax). Pruned searches are
+    often too small to pay for the task overhead, so the pool only helps deep ones. game is an optional per-game GameState wrapping
+    the same collections, used to resolve the shot.
+    """
+    if game is None:
+        game = GameState(ships, enemy_hits, enemy_misses, current_hits, occupied)
+    if not current_hits:
+        mode = "hunt"
+    else:
+        mode = "target"
+
+    if mode == "target":
+        shot, updated_current_hits = enhanced_target_shot_multi_ship(current_hits, occupied, enemy_hits, enemy_misses, ships, game)
+        current_hits[:] = updated_current_hits  # Update the list in place
+
+        if shot is None:
+            # No valid target shots remaining (all neighbors tried), clear current hits and go back to hunt
+            if verbose:
+                print(f"Expectimax multi-ship target mode complete: all neighbors of remaining unsunk ships have been tried, switching to hunt mode")
+            current_hits.clear()
+            mode = "hunt"
+        else:
+            r,c = shot
+            ship = game.fire(r, c)
+            if ship is not None:
+                current_hits.append((r,c))
+                if game.is_sunk(ship) and verbose:
+                    # Ship is sunk, but don't clear current_hits yet
+                    # The enhanced_target_shot_multi_ship function will filter out hits from sunk ships
+                    print(f"Expectimax: Ship sunk! But continuing target mode to check for adjacent unsunk ships. Current hits: {current_hits}")
+            return mode
+
+    # hunt mode -> expectimax
+    if table is None:
+        table = TranspositionTable()
+    if pool is not None and time_limit is None:
+        stats = {}
+        _, shot = parallel_expectimax(pool, ships, occupied, enemy_hits, enemy_misses, max_depth, split_outcomes, table,
+                                      stats=stats)
+        if verbose:
+            print(f"Expectimax ran {stats['tasks']} root tasks in the pool, pruned {stats['pruned']} candidates")
+    else:
+        state = SearchState(ships, occupied, enemy_hits, enemy_misses)
+        if time_limit is not None:
+            _, shot, depth = iterative_deepening(state, max_depth, time_limit, table)
+            if verbose:
+                print(f"Expectimax iterative deepening reached depth {depth}")
+        else:
+            stats = {}
+            _, shot = expectimax(state, max_depth, table, stats=stats)
+            if verbose:
+                print(f"Expectimax searched {stats['nodes']} nodes, pruned {stats.get('pruned', 0)} subtrees")
+        if verbose:
+            print(f"Expectimax transposition table: {table.counters()}")
+    if shot is None:
+        return mode
+    r,c = shot
+    ship = game.fire(r, c)
+    if ship is not None:
+        current_hits.append((r,c))
+        if game.is_sunk(ship):
+            # Ship is sunk, but don't clear current_hits yet in hunt mode either
+            # The enhanced_target_shot_multi_ship function will filter out hits from sunk ships
+            if verbose:
+                print(f"Expectimax hunt mode: Ship sunk! Switching to target mode to check for adjacent unsunk ships. Current hits: {current_hits}")
+            mode = "target"  # Switch to target mode to handle potential adjacent ships
+    return mode
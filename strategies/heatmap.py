@@ -0,0 +1,80 @@
+"""
+Heatmap AI - hunts with a placement-count probability heatmap, targets with multi-ship logic
+"""
+from game_utils import GRID_SIZE, GameState, enhanced_target_shot_multi_ship
+import heatmap_utils
+from heatmap_utils import compute_heatmap
+
+
+def ai_turn(ships, occupied, current_hits, enemy_hits, enemy_misses, verbose=False, heatmap_state=None, game=None):
+    """Perform one heatmap AI shot against ships, returns the new mode
+
+    heatmap_state is an optional per-game IncrementalHeatmap; when given it is caught
+    up with the new shots instead of rebuilding the heatmap from scratch. It is only
+    used by the pure-Python backend; with heatmap_utils.set_backend("numpy") the
+    heatmap is rebuilt by compute_heatmap on every turn. game is an
+    optional GameState wrapping the same collections, kept for the whole game so its
+    sunk counters are not rebuilt each turn.
+    """
+    if game is None:
+        game = GameState(ships, enemy_hits, enemy_misses, current_hits, occupied)
+
+    # Determine mode: hunt if no current hits, target if we have hits
+    if not current_hits:
+        mode = "hunt"
+    else:
+        mode = "target"
+
+    # Use remaining (unsunk) ship lengths for heatmap calculation
+    remaining_lengths = [len(ship) for ship in game.remaining_ships()]
+    if heatmap_state is not None and heatmap_utils.get_backend() == "python":
+        heatmap_state.update(enemy_hits | enemy_misses, remaining_lengths)
+        heatmap = heatmap_state.board()
+    else:
+        heatmap = compute_heatmap(occupied, remaining_lengths)
+
+    shot = None
+
+    if mode == "hunt":
+        # Hunt mode: find highest probability cell
+        max_val = -1
+        for i in range(len(heatmap)):
+            for j in range(len(heatmap[0])):
+                if heatmap[i][j] > max_val and occupied[i][j] == 0:
+                    max_val = heatmap[i][j]
+                    shot = (i, j)
+
+        # Fallback: if no shot found, pick any unoccupied cell
+        if shot is None:
+            for i in range(GRID_SIZE):
+                for j in range(GRID_SIZE):
+                    if occupied[i][j] == 0:
+                        shot = (i, j)
+                        break
+                if shot is not None:
+                    break
+    else:
+        # Target mode: try to finish off the ship using enhanced targeting for multiple ships
+        shot, updated_current_hits = enhanced_target_shot_multi_ship(current_hits, occupied, enemy_hits, enemy_misses, ships, game)
+        current_hits[:] = updated_current_hits  # Update the list in place
+
+        if shot is None:
+            # No valid target shots remaining (all neighbors tried), clear current hits and go back to hunt
+            if verbose:
+                print(f"Heatmap multi-ship target mode complete: all neighbors of remaining unsunk ships have been tried, switching to hunt mode")
+            current_hits.clear()
+            return ai_turn(ships, occupied, current_hits, enemy_hits, enemy_misses, verbose, heatmap_state, game)
+
+    if shot is None:
+        return mode
+
+    r, c = shot
+    ship = game.fire(r, c)
+    if ship is not None:
+        current_hits.append((r, c))
+        if game.is_sunk(ship) and verbose:
+            # Ship is sunk, but don't clear current_hits yet
+            # The enhanced_target_shot_multi_ship function will filter out hits from sunk ships
+            print(f"Ship sunk! But continuing target mode to check for adjacent unsunk ships. Current hits: {current_hits}")
+
+    return mode
@@ -0,0 +1,754 @@
+"""
+Monte Carlo AI - samples ship configurations consistent with known shots to score checkerboard cells
+"""
+import math
+import random
+import time
+
+from bitboard_utils import cell_bit, coords_to_mask, fleet_mask, legal_placements, mask_to_coords, placement_mask, placement_table
+from game_utils import GRID_SIZE, SHIP_SIZES, GameState, enhanced_target_shot_multi_ship, pool_workers
+from heatmap_utils import placements_through_cells
+
+
+def monte_carlo_ai_turn(ships, occupied, current_hits, enemy_hits, enemy_misses, simulations=20, verbose=False,
+                        samples=None, pool=None, time_budget=None, report=None, particles=None, sampler="direct",
+                        game=None):
+    """Monte Carlo AI that simulates possible ship configurations (optimized with checkerboard)
+
+    samples overrides the number of configurations drawn per move (default
+    min(simulations // 2, 10)). With pool, a concurrent.futures Executor, the sampling
+    is split across its workers and the per-cell hit counts are merged here.
+
+    time_budget (seconds) switches to anytime sampling: batches are drawn until the
+    budget runs out or the best cell's confidence interval clears the runner-up's.
+    report, if given, is a dict that receives 'samples', 'margin' and 'elapsed'.
+
+    particles, a per-game ParticleSet, keeps the sampled configurations between turns:
+    each turn filters them by the new shots and only samples replacements. With
+    time_budget, new particles are added until the budget runs out or the best cell
+    is clear; with pool, they are sampled across its workers.
+
+    sampler picks how configurations are drawn: "direct" placement-table sampling or
+    "mcmc" (MCMCSampler), which keeps producing samples in dense endgame positions.
+
+    game is an optional per-game GameState wrapping the same collections, used to
+    resolve the shot and to find the ships still afloat.
+    """
+    if game is None:
+        game = GameState(ships, enemy_hits, enemy_misses, current_hits, occupied)
+    # Determine mode
+    if not current_hits:
+        mode = "hunt"
+    else:
+        mode = "target"
+
+    # If in target mode, prioritize adjacent shots to current hits
+    if mode == "target":
+        shot, updated_current_hits = enhanced_target_shot_multi_ship(current_hits, occupied, enemy_hits, enemy_misses, ships, game)
+        current_hits[:] = updated_current_hits  # Update the list in place
+
+        if shot is not None:
+            return execute_shot(game, shot[0], shot[1], mode, verbose)
+        else:
+            # No valid target shots remaining (all neighbors tried), clear current hits and go back to hunt
+            if verbose:
+                print(f"Monte Carlo multi-ship target mode complete: all neighbors of remaining unsunk ships have been tried, switching to hunt mode")
+            current_hits.clear()
+            mode = "hunt"
+
+    # Hunt mode: Only consider checkerboard positions + Monte Carlo
+    available_shots = []
+    checkerboard_shots = []
+
+    for r in range(GRID_SIZE):
+        for c in range(GRID_SIZE):
+            if occupied[r][c] == 0:
+                available_shots.append((r, c))
+                # Checkerboard pattern: only cells where (r + c) is even
+                if (r + c) % 2 == 0:
+                    checkerboard_shots.append((r, c))
+
+    if not available_shots:
+        return mode
+
+    # If we still have checkerboard positions available, only use those
+    shots_to_evaluate = checkerboard_shots if checkerboard_shots else available_shots
+
+    if verbose:
+        print(f"Evaluating {len(shots_to_evaluate)} checkerboard positions (of {len(available_shots)} total)")
+
+    # Calculate ship sizes still in play
+    remaining_ship_sizes = [len(ship) for ship in game.remaining_ships()]
+    # Hits on unsunk ships must be covered, cells of sunk ships are as unavailable as misses
+    unsunk_hits, sunk_cells = split_hits(game)
+
+    # Reduced simulation count and smarter evaluation
+    shot_scores = {}
+
+    # Count how many sampled configurations cover each cell
+    if samples is None:
+        samples = min(simulations // 2, 10)  # Generate fewer configurations
+    known_misses = enemy_misses | sunk_cells
+    if particles is not None:
+        particles.sync(ships, enemy_hits, enemy_misses)
+        kept = len(particles.particles)
+        if time_budget is not None:
+            report = {} if report is None else report
+            counts = particles.replenish_anytime(unsunk_hits, known_misses, shots_to_evaluate, time_budget, pool=pool,
+                                                 report=report, sampler=sampler)
+        else:
+            particles.replenish(samples, unsunk_hits, known_misses, sampler=sampler, pool=pool)
+            counts = particles.hit_counts()
+        accepted = len(particles.particles)
+        sampler_stats = particles.stats
+        if verbose:
+            print(f"Particle filter kept {kept} configurations, sampled {accepted - kept} new")
+    elif time_budget is not None:
+        report = {} if report is None else report
+        counts, accepted, sampler_stats = anytime_hit_counts(remaining_ship_sizes, unsunk_hits, known_misses,
+                                                             shots_to_evaluate, time_budget, pool=pool, report=report,
+                                                             sampler=sampler)
+        if verbose:
+            print(f"Anytime Monte Carlo drew {report['samples']} samples in {report['elapsed']:.3f}s, margin {report['margin']}")
+    elif pool is not None and samples > 1:
+        counts, accepted, sampler_stats = parallel_hit_counts(pool, remaining_ship_sizes, unsunk_hits, known_misses, samples,
+                                                              sampler=sampler)
+    else:
+        counts, accepted, sampler_stats = sample_hit_counts(remaining_ship_sizes, unsunk_hits, known_misses, samples,
+                                                            sampler=sampler)
+
+    if verbose and sampler_stats['attempts']:
+        print(f"Sampler accepted {sampler_stats['accepted']}/{sampler_stats['attempts']} attempts")
+        if 'mcmc' in sampler_stats:
+            print(f"MCMC diagnostics: {sampler_stats['mcmc']}")
+
+    if not accepted:
+        # Fallback to random shot from checkerboard positions if no valid configurations found
+        best_shot = random.choice(shots_to_evaluate)
+        if verbose:
+            print(f"Fallback checkerboard shot: {best_shot}")
+        return execute_shot(game, best_shot[0], best_shot[1], mode, verbose)
+
+    # Evaluate shots against the sampled configurations
+    for shot in shots_to_evaluate:
+        shot_scores[shot] = counts[shot[0] * GRID_SIZE + shot[1]] / accepted
+
+    # Choose the shot with highest score
+    best_shot = max(shot_scores.keys(), key=lambda s: shot_scores[s])
+    if verbose:
+        is_checkerboard = (best_shot[0] + best_shot[1]) % 2 == 0
+        print(f"Monte Carlo chose {'checkerboard' if is_checkerboard else 'regular'} shot {best_shot} with score {shot_scores[best_shot]:.3f}")
+
+    return execute_shot(game, best_shot[0], best_shot[1], mode, verbose)
+
+
+def split_hits(game):
+    """Split a GameState's hits into (hits on unsunk ships, cells of sunk ships)"""
+    unsunk_hits = set()
+    sunk_cells = set()
+    for coord in game.hits:
+        if game.is_sunk(game.cell_ship[coord]):
+            sunk_cells.add(coord)
+        else:
+            unsunk_hits.add(coord)
+    return unsunk_hits, sunk_cells
+
+
+def evaluate_shot_monte_carlo(shot, remaining_ship_sizes, known_hits, known_misses, simulations):
+    """Evaluate a shot using Monte Carlo simulation"""
+    hit_count = 0
+    total_simulations = 0
+
+    for _ in range(simulations):
+        # Generate a random configuration of remaining ships
+        ship_config = generate_random_ship_configuration(remaining_ship_sizes, known_hits, known_misses)
+        if ship_config is None:
+            continue
+
+        total_simulations += 1
+
+        # Check if this shot would hit in this configuration
+        if shot in ship_config:
+            hit_count += 1
+
+    if total_simulations == 0:
+        return 0.0
+
+    return hit_count / total_simulations
+
+
+def generate_random_ship_configuration(ship_sizes, known_hits, known_misses, stats=None, rng=random):
+    """Generate a random ship configuration consistent with known information
+
+    Ships are drawn from the precomputed placements that avoid known_misses. Placements
+    covering the known hits are chosen first, so every accepted configuration covers
+    them by construction. Returns a set of coordinates, or None if no attempt succeeded.
+    stats, if given, is a dict whose 'attempts' and 'accepted' counters are updated.
+    """
+    hits, blocked, legal = _sampling_constraints(ship_sizes, known_hits, known_misses)
+    placed = _sample_configuration(ship_sizes, hits, blocked, legal, stats, rng)
+    if placed is None:
+        return None  # Failed to generate valid configuration
+    return set(mask_to_coords(fleet_mask(placed)))
+
+
+def sample_hit_counts(ship_sizes, known_hits, known_misses, samples, seed=None, sampler="direct"):
+    """Draw samples configurations and count how many of them cover each cell
+
+    Returns (counts indexed row * GRID_SIZE + col, configurations accepted, sampler stats).
+    seed gives the call its own RNG stream, as pool workers need; None uses the random module.
+    sampler is "direct" (independent placement-table draws) or "mcmc" (MCMCSampler chain).
+    """
+    rng = random if seed is None else random.Random(seed)
+    counts = [0] * (GRID_SIZE * GRID_SIZE)
+    stats = {'attempts': 0, 'accepted': 0}
+    for placed in _draw_configurations(ship_sizes, known_hits, known_misses, samples, stats, rng, sampler):
+        _add_cell_counts(counts, fleet_mask(placed))
+    return counts, stats['accepted'], stats
+
+
+def sample_configurations(ship_sizes, known_hits, known_misses, samples, seed=None, sampler="direct"):
+    """Draw samples configurations, returns (list of ship-mask tuples, sampler stats)
+
+    The configuration counterpart of sample_hit_counts, for pool workers filling a
+    ParticleSet.
+    """
+    rng = random if seed is None else random.Random(seed)
+    stats = {'attempts': 0, 'accepted': 0}
+    configurations = list(_draw_configurations(ship_sizes, known_hits, known_misses, samples, stats, rng, sampler))
+    return configurations, stats
+
+
+def parallel_hit_counts(pool, ship_sizes, known_hits, known_misses, samples, chunks=None, sampler="direct"):
+    """sample_hit_counts spread over an Executor, merging the per-cell counts
+
+    Each chunk gets its own seed drawn from the random module, so results are
+    reproducible for a seeded parent no matter which worker runs which chunk.
+    """
+    chunks = chunks or min(samples, pool_workers(pool))
+    sizes = [samples // chunks + (1 if i < samples % chunks else 0) for i in range(chunks)]
+    futures = [pool.submit(sample_hit_counts, ship_sizes, known_hits, known_misses, size, random.getrandbits(64), sampler)
+               for size in sizes if size]
+
+    counts = [0] * (GRID_SIZE * GRID_SIZE)
+    accepted = 0
+    stats = {'attempts': 0, 'accepted': 0}
+    for future in futures:
+        chunk_counts, chunk_accepted, chunk_stats = future.result()
+        for idx, count in enumerate(chunk_counts):
+            counts[idx] += count
+        accepted += chunk_accepted
+        stats['attempts'] += chunk_stats['attempts']
+        stats['accepted'] += chunk_stats['accepted']
+    return counts, accepted, stats
+
+
+def anytime_hit_counts(ship_sizes, known_hits, known_misses, cells, time_budget, z=1.96, batch=32,
+                       min_samples=64, pool=None, report=None, sampler="direct"):
+    """Sample in batches until time_budget expires or the top cell is clearly ahead
+
+    Sampling stops early once the lower confidence bound (z standard errors) of the
+    best cell among cells exceeds the upper bound of the runner-up. Returns the same
+    triple as sample_hit_counts; report, if given, gets the samples drawn, the final
+    margin between those bounds and the elapsed time.
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget
+    counts = [0] * (GRID_SIZE * GRID_SIZE)
+    accepted = 0
+    stats = {'attempts': 0, 'accepted': 0}
+    margin = None
+
+    while True:
+        if pool is not None:
+            batch_counts, batch_accepted, batch_stats = parallel_hit_counts(
+                pool, ship_sizes, known_hits, known_misses, batch * pool_workers(pool), sampler=sampler)
+        else:
+            batch_counts, batch_accepted, batch_stats = sample_hit_counts(ship_sizes, known_hits, known_misses, batch,
+                                                                          sampler=sampler)
+        for idx, count in enumerate(batch_counts):
+            counts[idx] += count
+        accepted += batch_accepted
+        stats['attempts'] += batch_stats['attempts']
+        stats['accepted'] += batch_stats['accepted']
+
+        if accepted >= min_samples:
+            margin = confidence_margin(counts, accepted, cells, z)
+            if margin > 0:
+                break
+        if time.perf_counter() >= deadline:
+            break
+
+    if report is not None:
+        report['samples'] = accepted
+        report['margin'] = margin
+        report['elapsed'] = time.perf_counter() - start
+    return counts, accepted, stats
+
+
+def confidence_margin(counts, total, cells, z=1.96):
+    """Gap between the best cell's lower confidence bound and the runner-up's upper bound
+
+    Positive means the best cell is ahead with confidence; uses normal intervals on the
+    per-cell hit proportions.
+    """
+    if len(cells) < 2:
+        return math.inf
+    ranked = sorted((counts[r * GRID_SIZE + c] for r, c in cells), reverse=True)
+    best, runner_up = ranked[0] / total, ranked[1] / total
+    best_se = math.sqrt(best * (1 - best) / total)
+    runner_up_se = math.sqrt(runner_up * (1 - runner_up) / total)
+    return (best - z * best_se) - (runner_up + z * runner_up_se)
+
+
+class ParticleSet:
+    """Sampled configurations kept for a whole game and filtered by each new observation
+
+    Each particle is (fleet mask, per-ship masks in ship_sizes order). Observations are
+    exact, so reweighting a particle means keeping it (weight 1) or dropping it
+    (weight 0): a hit keeps particles covering the cell, a miss keeps those that
+    don't, and a sunk ship keeps particles holding exactly that ship and removes it.
+    The survivors are still draws consistent with everything seen, so only the
+    dropped ones need to be replaced.
+    """
+    __slots__ = ('ship_sizes', 'particles', 'shots', 'sunk', 'stats')
+
+    def __init__(self, ship_sizes=SHIP_SIZES):
+        self.ship_sizes = list(ship_sizes)
+        self.particles = []
+        self.shots = set()
+        self.sunk = set()
+        self.stats = {'attempts': 0, 'accepted': 0, 'dropped': 0}
+
+    def sync(self, ships, enemy_hits, enemy_misses):
+        """Filter the particles by every shot and sinking not seen yet"""
+        particles = self.particles
+        before = len(particles)
+        for cell in (enemy_hits | enemy_misses) - self.shots:
+            bit = cell_bit(*cell)
+            if cell in enemy_hits:
+                particles = [p for p in particles if p[0] & bit]
+            else:
+                particles = [p for p in particles if not p[0] & bit]
+            self.shots.add(cell)
+
+        for ship in ships:
+            mask = coords_to_mask(ship)
+            if mask in self.sunk or not all(coord in enemy_hits for coord in ship):
+                continue
+            self.sunk.add(mask)
+            self.ship_sizes.remove(len(ship))
+            kept = []
+            for fleet, placed in particles:
+                if mask in placed:
+                    i = placed.index(mask)
+                    kept.append((fleet ^ mask, placed[:i] + placed[i + 1:]))
+            particles = kept
+
+        self.stats['dropped'] += before - len(particles)
+        self.particles = particles
+
+    def replenish(self, target, known_hits, known_misses, rng=random, sampler="direct", pool=None):
+        """Sample new particles until there are target of them (or sampling keeps failing)
+
+        With pool, a concurrent.futures Executor, the missing particles are sampled
+        across its workers, each chunk seeded from rng.
+        """
+        missing = target - len(self.particles)
+        if missing > 0:
+            self._add(missing, known_hits, known_misses, rng, sampler, pool)
+
+    def replenish_anytime(self, known_hits, known_misses, cells, time_budget, z=1.96, batch=32, min_samples=64,
+                          pool=None, report=None, rng=random, sampler="direct"):
+        """Add particles in batches until time_budget expires or the top cell is clearly ahead
+
+        The anytime_hit_counts stopping rule, with the surviving particles counted
+        towards min_samples and the confidence margin: a turn whose survivors already
+        separate the best cell among cells samples nothing new. Returns the per-cell
+        counts over all particles; report gets 'samples', 'margin' and 'elapsed'.
+        """
+        start = time.perf_counter()
+        deadline = start + time_budget
+        counts = self.hit_counts()
+        margin = None
+        if pool is not None:
+            batch *= pool_workers(pool)
+
+        while True:
+            total = len(self.particles)
+            if total >= min_samples:
+                margin = confidence_margin(counts, total, cells, z)
+                if margin > 0:
+                    break
+            self._add(batch, known_hits, known_misses, rng, sampler, pool)
+            for fleet, _ in self.particles[total:]:
+                _add_cell_counts(counts, fleet)
+            if time.perf_counter() >= deadline:
+                break
+
+        if report is not None:
+            report['samples'] = len(self.particles)
+            report['margin'] = margin
+            report['elapsed'] = time.perf_counter() - start
+        return counts
+
+    def _add(self, count, known_hits, known_misses, rng, sampler, pool):
+        """Sample up to count new particles, in this process or across pool"""
+        if pool is None or count < 2:
+            # A surviving particle is a valid state to start an MCMC chain from
+            initial = self.particles[-1][1] if self.particles else None
+            drawn = _draw_configurations(self.ship_sizes, known_hits, known_misses, count, self.stats, rng, sampler,
+                                         initial)
+            self.particles.extend((fleet_mask(placed), placed) for placed in drawn)
+            return
+        chunks = min(count, pool_workers(pool))
+        sizes = [count // chunks + (1 if i < count % chunks else 0) for i in range(chunks)]
+        futures = [pool.submit(sample_configurations, self.ship_sizes, known_hits, known_misses, size,
+                               rng.getrandbits(64), sampler) for size in sizes]
+        for future in futures:
+            drawn, chunk_stats = future.result()
+            self.particles.extend((fleet_mask(placed), placed) for placed in drawn)
+            self.stats['attempts'] += chunk_stats['attempts']
+            self.stats['accepted'] += chunk_stats['accepted']
+
+    def hit_counts(self):
+        """Per-cell number of particles covering each cell, indexed row * GRID_SIZE + col"""
+        counts = [0] * (GRID_SIZE * GRID_SIZE)
+        for fleet, _ in self.particles:
+            _add_cell_counts(counts, fleet)
+        return counts
+
+
+class MCMCSampler:
+    """Markov-chain sampler of ship configurations consistent with known hits and misses
+
+    The chain walks over valid configurations (no overlaps, no blocked cells, every
+    known hit covered) with symmetric Metropolis proposals, accepted whenever the result
+    is valid, so its stationary distribution is uniform over valid configurations:
+      - relocate: move one ship to a random legal placement, possibly rotated
+      - shift: slide one ship a cell in any direction, or rotate it about its first cell
+      - swap: exchange the anchors (first cell and orientation) of two ships
+    The chain starts from initial (ship masks, such as a surviving particle) if that is
+    still valid, else from a direct sample, else from a backtracking search, so dense
+    endgame positions where direct sampling fails still get a starting state. It runs
+    burn_in steps, and keeps one state every thinning steps.
+    """
+    __slots__ = ('ship_sizes', 'hits', 'blocked', 'legal', 'thinning', 'rng', 'state', 'fleet', 'last', 'stats')
+
+    MOVES = ('relocate', 'shift', 'swap')
+
+    def __init__(self, ship_sizes, known_hits, known_misses, burn_in=200, thinning=10, rng=random, init_attempts=50,
+                 initial=None):
+        self.ship_sizes = list(ship_sizes)
+        self.hits, self.blocked, self.legal = _sampling_constraints(self.ship_sizes, known_hits, known_misses)
+        self.thinning = thinning
+        self.rng = rng
+        self.stats = {'proposals': 0, 'accepted': 0, 'samples': 0, 'changed': 0, 'distance': 0}
+        for move in self.MOVES:
+            self.stats[move + '_proposals'] = 0
+            self.stats[move + '_accepted'] = 0
+        self.state = None
+        self.last = None
+        if initial is not None and self._is_valid(initial):
+            self.state = list(initial)
+        for _ in range(init_attempts if self.state is None else 0):
+            placed = _sample_configuration(self.ship_sizes, self.hits, self.blocked, self.legal, None, rng)
+            if placed is not None:
+                self.state = list(placed)
+                break
+        if self.state is None:
+            # Dense positions where direct sampling keeps failing are the ones the chain is for
+            placed = _search_configuration(self.ship_sizes, self.hits, self.blocked, self.legal, rng)
+            if placed is not None:
+                self.state = list(placed)
+        self.fleet = fleet_mask(self.state) if self.state else 0
+        if self.state:
+            self.step(burn_in)
+
+    def _is_valid(self, placed):
+        """Whether ship masks in ship_sizes order form a valid configuration"""
+        if len(placed) != len(self.ship_sizes):
+            return False
+        fleet = 0
+        for size, mask in zip(self.ship_sizes, placed):
+            if bin(mask).count('1') != size or mask & (self.blocked | fleet):
+                return False
+            fleet |= mask
+        return not self.hits & ~fleet
+
+    def step(self, steps=1):
+        """Advance the chain by steps proposals"""
+        state = self.state
+        ship_sizes = self.ship_sizes
+        rng = self.rng
+        stats = self.stats
+        if not state:
+            return
+        for _ in range(steps):
+            move = rng.choice(self.MOVES)
+            i = rng.randrange(len(state))
+            stats['proposals'] += 1
+            stats[move + '_proposals'] += 1
+            if move == 'relocate':
+                changes = ((i, rng.choice(self.legal[ship_sizes[i]])[0]),)
+            elif move == 'shift':
+                row, col, horizontal = _placement_anchor(state[i])
+                dr, dc, rotate = rng.choice(((-1, 0, False), (1, 0, False), (0, -1, False), (0, 1, False), (0, 0, True)))
+                changes = ((i, _anchored_mask(row + dr, col + dc, ship_sizes[i], horizontal != rotate)),)
+            elif len(state) < 2:
+                continue  # Nothing to swap with, the proposal is rejected
+            else:
+                j = rng.randrange(len(state) - 1)
+                j += j >= i
+                row_i, col_i, horizontal_i = _placement_anchor(state[i])
+                row_j, col_j, horizontal_j = _placement_anchor(state[j])
+                changes = ((i, _anchored_mask(row_j, col_j, ship_sizes[i], horizontal_j)),
+                           (j, _anchored_mask(row_i, col_i, ship_sizes[j], horizontal_i)))
+            if self._apply_if_valid(changes):
+                stats['accepted'] += 1
+                stats[move + '_accepted'] += 1
+
+    def _apply_if_valid(self, changes):
+        """Replace ships per changes if the resulting configuration is valid"""
+        rest = self.fleet
+        for i, _ in changes:
+            rest ^= self.state[i]
+        fleet = rest
+        for _, mask in changes:
+            if not mask or mask & (self.blocked | fleet):
+                return False
+            fleet |= mask
+        if self.hits & ~fleet:
+            return False
+        for i, mask in changes:
+            self.state[i] = mask
+        self.fleet = fleet
+        return True
+
+    def sample_masks(self):
+        """Next thinned state as a tuple of ship masks, or None if no valid state was found"""
+        if self.state is None:
+            return None
+        self.step(self.thinning)
+        if self.last is not None:
+            distance = bin(self.fleet ^ self.last).count('1') // 2
+            self.stats['changed'] += distance > 0
+            self.stats['distance'] += distance
+        self.last = self.fleet
+        self.stats['samples'] += 1
+        return tuple(self.state)
+
+    def sample(self):
+        """Next thinned state as a set of coordinates, like generate_random_ship_configuration"""
+        placed = self.sample_masks()
+        if placed is None:
+            return None
+        return set(mask_to_coords(self.fleet))
+
+    def diagnostics(self):
+        """Acceptance rates per move and how far consecutive thinned samples are apart"""
+        stats = self.stats
+        pairs = max(stats['samples'] - 1, 1)
+        report = {
+            'samples': stats['samples'],
+            'acceptance_rate': stats['accepted'] / max(stats['proposals'], 1),
+            # Share of consecutive samples that differ, and mean cells moved between them
+            'changed_fraction': stats['changed'] / pairs,
+            'mean_distance': stats['distance'] / pairs,
+        }
+        for move in self.MOVES:
+            report[move + '_acceptance'] = stats[move + '_accepted'] / max(stats[move + '_proposals'], 1)
+        return report
+
+
+def generate_mcmc_ship_configuration(ship_sizes, known_hits, known_misses, stats=None, rng=random):
+    """MCMC counterpart of generate_random_ship_configuration with the same interface
+
+    The chain for the most recent constraints is kept, so repeated calls within a move
+    continue it (one thinned state each) instead of paying burn-in again.
+    """
+    global _mcmc_chain
+    key = (tuple(ship_sizes), frozenset(known_hits), frozenset(known_misses))
+    if _mcmc_chain is None or _mcmc_chain[0] != key:
+        _mcmc_chain = (key, MCMCSampler(ship_sizes, known_hits, known_misses, rng=rng))
+    # The chain continues with the caller's RNG, not the one it was created with
+    _mcmc_chain[1].rng = rng
+    config = _mcmc_chain[1].sample()
+    if stats is not None:
+        stats['attempts'] = stats.get('attempts', 0) + 1
+        stats['accepted'] = stats.get('accepted', 0) + (config is not None)
+    return config
+
+
+_mcmc_chain = None
+
+
+def _draw_configurations(ship_sizes, known_hits, known_misses, count, stats, rng, sampler, initial=None):
+    """Yield up to count configurations (tuples of ship masks) from the chosen sampler
+
+    initial, a known valid configuration, is where an MCMC chain starts.
+    """
+    if sampler == "mcmc":
+        chain = MCMCSampler(ship_sizes, known_hits, known_misses, rng=rng, initial=initial)
+        for _ in range(count):
+            placed = chain.sample_masks()
+            stats['attempts'] = stats.get('attempts', 0) + 1
+            if placed is None:
+                return
+            stats['accepted'] = stats.get('accepted', 0) + 1
+            yield placed
+        stats['mcmc'] = chain.diagnostics()
+    elif sampler == "direct":
+        hits, blocked, legal = _sampling_constraints(ship_sizes, known_hits, known_misses)
+        for _ in range(count):
+            placed = _sample_configuration(ship_sizes, hits, blocked, legal, stats, rng)
+            if placed is not None:
+                yield placed
+    else:
+        raise ValueError(f"Unknown sampler {sampler!r}, expected 'direct' or 'mcmc'")
+
+
+def _placement_anchor(mask):
+    """(row, col, horizontal) of a ship mask's first cell"""
+    idx = (mask & -mask).bit_length() - 1
+    row, col = divmod(idx, GRID_SIZE)
+    return row, col, not (mask >> (idx + GRID_SIZE)) & 1
+
+
+def _anchored_mask(row, col, size, horizontal):
+    """Placement mask anchored at (row, col), or 0 if any part is off the board"""
+    if row < 0 or col < 0 or row >= GRID_SIZE or col >= GRID_SIZE:
+        return 0
+    return placement_mask(row, col, size, horizontal)
+
+
+def _add_cell_counts(counts, fleet):
+    """Add 1 to counts for every cell set in the fleet mask"""
+    while fleet:
+        low = fleet & -fleet
+        counts[low.bit_length() - 1] += 1
+        fleet ^= low
+
+
+def _sampling_constraints(ship_sizes, known_hits, known_misses):
+    """Known hits and blocked cells as masks, plus the legal placements per ship size"""
+    hits = coords_to_mask(known_hits)
+    blocked = coords_to_mask(known_misses)
+    legal = {size: legal_placements(blocked, size) for size in set(ship_sizes)}
+    return hits, blocked, legal
+
+
+def _sample_configuration(ship_sizes, hits, blocked, legal, stats, rng):
+    """Up to 20 attempts at a configuration, returns one mask per ship (in ship_sizes order) or None"""
+    if hits & blocked:
+        return None
+    for attempt in range(20):
+        if stats is not None:
+            stats['attempts'] = stats.get('attempts', 0) + 1
+        placed = _sample_fleet(ship_sizes, hits, blocked, legal, rng)
+        if placed is not None:
+            if stats is not None:
+                stats['accepted'] = stats.get('accepted', 0) + 1
+            return placed
+    return None
+
+
+def _sample_fleet(ship_sizes, hits, blocked, legal, rng):
+    """One attempt at placing every ship, returns a tuple of ship masks or None"""
+    unplaced = list(range(len(ship_sizes)))
+    placed = [0] * len(ship_sizes)
+    fleet = 0
+
+    # Cover the known hits first: pick a ship and placement through the lowest uncovered hit
+    uncovered = hits
+    while uncovered:
+        bit = uncovered & -uncovered
+        idx = bit.bit_length() - 1
+        candidates = []
+        for i, ship in enumerate(unplaced):
+            size = ship_sizes[ship]
+            table = placement_table(size)
+            for p in placements_through_cells(size)[idx]:
+                mask = table[p][0]
+                if not mask & (blocked | fleet):
+                    candidates.append((i, mask))
+        if not candidates:
+            return None
+        i, mask = rng.choice(candidates)
+        fleet |= mask
+        uncovered &= ~mask
+        placed[unplaced.pop(i)] = mask
+
+    # Place the rest anywhere legal
+    for ship in unplaced:
+        placements = legal[ship_sizes[ship]]
+        if not placements:
+            return None
+        for _ in range(8):
+            mask = rng.choice(placements)[0]
+            if not mask & fleet:
+                break
+        else:
+            free = [mask for mask, _ in placements if not mask & fleet]
+            if not free:
+                return None
+            mask = rng.choice(free)
+        fleet |= mask
+        placed[ship] = mask
+
+    return tuple(placed)
+
+
+def _search_configuration(ship_sizes, hits, blocked, legal, rng, limit=100000):
+    """Backtracking search for any valid configuration, returns one mask per ship or None
+
+    Covers the lowest uncovered hit first with every ship and placement that can,
+    then places the remaining ships, trying options in random order. Gives up after
+    limit placements tried.
+    """
+    if hits & blocked:
+        return None
+    placed = [0] * len(ship_sizes)
+    budget = [limit]
+
+    def search(unplaced, fleet):
+        budget[0] -= 1
+        if budget[0] < 0:
+            return False
+        uncovered = hits & ~fleet
+        if uncovered:
+            idx = (uncovered & -uncovered).bit_length() - 1
+            options = []
+            for ship in unplaced:
+                size = ship_sizes[ship]
+                table = placement_table(size)
+                options.extend((ship, table[p][0]) for p in placements_through_cells(size)[idx]
+                               if not table[p][0] & (blocked | fleet))
+        elif unplaced:
+            ship = unplaced[0]
+            options = [(ship, mask) for mask, _ in legal[ship_sizes[ship]] if not mask & fleet]
+        else:
+            return True
+        rng.shuffle(options)
+        for ship, mask in options:
+            placed[ship] = mask
+            if search([other for other in unplaced if other != ship], fleet | mask):
+                return True
+        return False
+
+    if search(list(range(len(ship_sizes))), 0):
+        return tuple(placed)
+    return None
+
+
+def execute_shot(game, r, c, mode, verbose=False):
+    """Execute a shot and update game state"""
+    ship = game.fire(r, c)
+    if ship is not None:
+        game.current_hits.append((r, c))
+        if game.is_sunk(ship) and verbose:
+            # Ship is sunk, but don't clear current_hits yet
+            # The enhanced_target_shot_multi_ship function will filter out hits from sunk ships
+            print(f"Monte Carlo: Ship sunk! But continuing target mode to check for adjacent unsunk ships. Current hits: {game.current_hits}")
+
+    return mode
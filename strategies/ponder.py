@@ -0,0 +1,90 @@
+"""
+Pondering - computes an AI's next shot on a background thread during the human's turn
+
+The AI's information state (its own shots and the fleet it fires at) does not change
+while the human plays, so its next shot can be worked out as soon as the previous one
+resolves. The turn function runs on a clone() of the game's GameState, and its shot is
+fired on the live state when the game asks for it.
+
+Per-game engine state passed in the options (heatmap_state, particles, table) is
+used by the worker thread, so the game must not call the engine directly while a
+move is being pondered. A game loop can poll ready() each frame and only take() the
+shot once it is done, so the window keeps running however long the engine thinks.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+def _snapshot(game):
+    return tuple(game.current_hits), frozenset(game.hits), frozenset(game.misses)
+
+
+def _play(turn, game, options):
+    return turn(game.ships, game.occupied, game.current_hits, game.hits, game.misses, game=game, **options)
+
+
+def _run_turn(turn, game, options):
+    return _play(turn, game, options), game
+
+
+class Ponderer:
+    """Runs one engine's next turn ahead of time on a single worker thread"""
+    __slots__ = ('turn', 'executor', 'future', 'snapshot')
+
+    def __init__(self, turn, executor=None):
+        self.turn = turn
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="ponder")
+        self.future = None
+        self.snapshot = None
+
+    def start(self, game, **options):
+        """Begin computing the next shot from game's current state"""
+        self.cancel()
+        self.snapshot = _snapshot(game)
+        self.future = self.executor.submit(_run_turn, self.turn, game.clone(), options)
+
+    def pending(self):
+        """Whether a move has been started and not yet taken"""
+        return self.future is not None
+
+    def ready(self):
+        """Whether the started move has finished, so take() will not block"""
+        return self.future is not None and self.future.done()
+
+    def cancel(self):
+        """Drop the pondered move without waiting for it
+
+        A move already running finishes on the worker thread and its result is thrown
+        away; the next start() queues behind it.
+        """
+        if self.future is not None:
+            self.future.cancel()
+        self.future = None
+        self.snapshot = None
+
+    def take(self, game, **options):
+        """Fire the next shot on game, returns the new mode
+
+        Waits for the pondered shot if it was started from this same state, otherwise
+        (or if nothing was pondered) plays the turn now.
+        """
+        future, snapshot = self.future, self.snapshot
+        if future is None or snapshot != _snapshot(game):
+            self.cancel()
+            # A stale move may still be using the same options, let it finish first
+            if future is not None:
+                wait([future])
+            return _play(self.turn, game, options)
+
+        self.future = None
+        self.snapshot = None
+        mode, pondered = future.result()
+        game.current_hits[:] = pondered.current_hits
+        if pondered.shots() > game.shots():
+            row, col, _ = pondered.last_shot
+            game.fire(row, col)
+        return mode
+
+    def shutdown(self):
+        """Stop the worker thread once any running move finishes, without waiting for it"""
+        self.cancel()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,203 @@
+"""
+Headless tournament runner - plays the AI strategies against random fleets across a process pool
+
+Usage:
+    python tournament.py --games 100000 --workers 32 heatmap montecarlo expectimax
+    python tournament.py --games 100000 --corpus fleets.bin
+    python tournament.py --games 1000 --replay games.log heatmap
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import heatmap_utils
+from corpus_utils import open_corpus
+from game_utils import GRID_SIZE, SHIP_SIZES, GameState, generate_ships
+from replay_utils import ReplayWriter
+from statistics_utils import summarize_shot_counts
+from strategies import STRATEGIES, new_game_options
+
+
+def play_game(strategy, ships, moves=None, **options):
+    """Play one headless game of strategy against ships, returns the number of shots taken
+
+    moves, if given, is a list that receives (row, col, hit, sunk, seconds) per shot.
+    """
+    turn = STRATEGIES[strategy]
+    options = {**new_game_options(strategy), **options}
+    game = GameState(ships)
+    shots = 0
+
+    while not game.all_sunk() and shots < GRID_SIZE * GRID_SIZE:
+        start = time.perf_counter()
+        turn(ships, game.occupied, game.current_hits, game.hits, game.misses, game=game, **options)
+        elapsed = time.perf_counter() - start
+
+        if game.shots() == shots:
+            raise RuntimeError(f"{strategy} AI made no shot after {shots} shots")
+        shots = game.shots()
+        if moves is not None:
+            row, col, ship = game.last_shot
+            moves.append((row, col, ship is not None, ship is not None and game.is_sunk(ship), elapsed))
+
+    return shots
+
+
+def _play(strategy, ships, options, seed, record):
+    # The fleet is drawn before this, so the engine's RNG stream depends on the seed alone
+    random.seed(seed)
+    if not record:
+        return play_game(strategy, ships, **options)
+    moves = []
+    return play_game(strategy, ships, moves, **options), ships, moves
+
+
+def play_seeded_game(strategy, options, seed, record=False):
+    """Worker entry point - generate a fleet from seed and play it with the RNG seeded
+
+    With record, returns (shots, ships, moves) for a replay log instead of the shots.
+    """
+    ships = generate_ships(random.Random(seed))
+    return _play(strategy, ships, options, seed, record)
+
+
+def play_corpus_game(strategy, options, corpus, seed, record=False):
+    """Worker entry point - play fleet number seed of a corpus file with the RNG seeded"""
+    ships = open_corpus(corpus).ships(seed)
+    return _play(strategy, ships, options, seed, record)
+
+
+def _collect(strategy, options, seeds, results, replay):
+    """Shot counts of the games' results, writing each game and its options to replay as it arrives"""
+    if replay is None:
+        return list(results)
+    shot_counts = []
+    for seed, (shots, ships, moves) in zip(seeds, results):
+        replay.write_game(strategy, seed, ships, moves, options)
+        shot_counts.append(shots)
+    return shot_counts
+
+
+def run_strategy(strategy, games, workers=None, seed=0, chunksize=None, options=None, backend="python", corpus=None,
+                 replay=None):
+    """Play games of one strategy in a process pool, returns (shot_counts, elapsed_seconds)
+
+    Game i uses seed + i, so every strategy run with the same seed faces the same fleets.
+    With corpus, the path of a fleet corpus file, game i plays its fleet seed + i
+    instead of a generated one; each worker maps the file once. replay, a ReplayWriter,
+    receives every game's fleet, shots and options in game order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        # A few chunks per worker keeps IPC overhead low while still balancing load
+        chunksize = max(1, games // (workers * 4))
+    options = options or {}
+    record = replay is not None
+    if corpus is None:
+        job = partial(play_seeded_game, strategy, options, record=record)
+    else:
+        job = partial(play_corpus_game, strategy, options, corpus, record=record)
+    seeds = range(seed, seed + games)
+
+    start = time.perf_counter()
+    if workers == 1:
+        heatmap_utils.set_backend(backend)
+        shot_counts = _collect(strategy, options, seeds, map(job, seeds), replay)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=heatmap_utils.set_backend, initargs=(backend,)) as pool:
+            shot_counts = _collect(strategy, options, seeds, pool.map(job, seeds, chunksize=chunksize), replay)
+    return shot_counts, time.perf_counter() - start
+
+
+def print_report(strategy, shot_counts, elapsed):
+    """Print throughput and the shot-count distribution for one strategy"""
+    summary = summarize_shot_counts(shot_counts)
+    print(f"\n=== {strategy.upper()} ===")
+    print(f"Games: {summary['games']} in {elapsed:.2f}s ({summary['games'] / elapsed:.1f} games/sec)")
+    if summary['games'] == 0:
+        return
+    print(f"Shots to win: mean {summary['mean']:.2f}, stdev {summary['stdev']:.2f}, "
+          f"min {summary['min']}, max {summary['max']}")
+    print("Percentiles: " + ", ".join(f"p{p}={v}" for p, v in summary['percentiles'].items()))
+
+    # Histogram in 5-shot buckets
+    buckets = {}
+    for shots, count in summary['histogram'].items():
+        bucket = shots - shots % 5
+        buckets[bucket] = buckets.get(bucket, 0) + count
+    peak = max(buckets.values())
+    for bucket, count in sorted(buckets.items()):
+        bar = "#" * max(1, round(40 * count / peak))
+        print(f"  {bucket:3}-{bucket + 4:<3} {count:8} {bar}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play the battleship AIs headlessly and report shots-to-win")
+    # Validated by hand: argparse rejects an empty nargs="*" list when choices is set
+    parser.add_argument("strategies", nargs="*", metavar="strategy",
+                        help=f"strategies to run, from {', '.join(STRATEGIES)} (default: all)")
+    parser.add_argument("--games", type=int, default=1000, help="games per strategy")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--chunksize", type=int, default=None, help="games per worker task")
+    parser.add_argument("--backend", default="python", choices=heatmap_utils.BACKENDS, help="heatmap backend")
+    parser.add_argument("--mc-samples", type=int, default=None, help="Monte Carlo configurations sampled per move")
+    parser.add_argument("--mc-time-budget", type=float, default=None,
+                        help="anytime Monte Carlo: seconds of sampling per move, stopping early once the best cell is clear")
+    parser.add_argument("--mc-sampler", default="direct", choices=["direct", "mcmc"],
+                        help="how Monte Carlo draws ship configurations")
+    parser.add_argument("--ex-depth", type=int, default=None, help="expectimax search depth")
+    parser.add_argument("--ex-time", type=float, default=None,
+                        help="expectimax seconds per move, deepening iteratively up to --ex-depth")
+    parser.add_argument("--corpus", default=None,
+                        help="fleet corpus file (see corpus_utils.py) to take fleets from, starting at fleet --seed")
+    parser.add_argument("--replay", default=None,
+                        help="append every game's fleet and shots to this replay log (see replay_utils.py)")
+    args = parser.parse_args()
+    unknown = [strategy for strategy in args.strategies if strategy not in STRATEGIES]
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(unknown)}")
+    if args.corpus is not None:
+        try:
+            corpus = open_corpus(args.corpus)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+        # The engines are built for the standard board and fleet
+        if corpus.n != GRID_SIZE or corpus.sizes != tuple(SHIP_SIZES):
+            parser.error(f"{args.corpus} holds fleets of {corpus.sizes} on a {corpus.n}x{corpus.n} grid, "
+                         f"expected {tuple(SHIP_SIZES)} on a {GRID_SIZE}x{GRID_SIZE} grid")
+        fleets = len(corpus)
+        if args.seed < 0 or args.seed + args.games > fleets:
+            parser.error(f"{args.corpus} holds {fleets} fleets, fewer than --seed + --games")
+
+    replay = None
+    if args.replay:
+        try:
+            replay = ReplayWriter(args.replay)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+    for strategy in args.strategies or list(STRATEGIES):
+        options = {}
+        if strategy == "montecarlo" and args.mc_samples:
+            options['samples'] = args.mc_samples
+        if strategy == "montecarlo" and args.mc_time_budget is not None:
+            options['time_budget'] = args.mc_time_budget
+        if strategy == "montecarlo" and args.mc_sampler != "direct":
+            options['sampler'] = args.mc_sampler
+        if strategy == "expectimax" and args.ex_depth:
+            options['max_depth'] = args.ex_depth
+        if strategy == "expectimax" and args.ex_time is not None:
+            options['time_limit'] = args.ex_time
+        shot_counts, elapsed = run_strategy(strategy, args.games, args.workers, args.seed, args.chunksize,
+                                            options, backend=args.backend, corpus=args.corpus, replay=replay)
+        print_report(strategy, shot_counts, elapsed)
+    if replay is not None:
+        replay.close()
+        print(f"\nAppended {replay.games} games to {args.replay}")
+
+
+if __name__ == "__main__":
+    main()